@@ -1,8 +1,10 @@
 import yfinance as yf
-import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
 
+from pembatas_upstream import panggil_yfinance, http_get
+from analisis_fundamental import ambil_info
+
 def get_time_ago(pub_time):
     now = datetime.now()
     diff = now - pub_time
@@ -18,9 +20,9 @@ def get_time_ago(pub_time):
 def get_news_from_yfinance(ticker_symbol):
     try:
         ticker = yf.Ticker(ticker_symbol)
-        info = ticker.info
+        info = ambil_info(ticker_symbol) or {}
         company_name = info.get("shortName", ticker_symbol)
-        news = ticker.news or []
+        news = panggil_yfinance(lambda: ticker.news) or []
         items = []
         for n in news[:10]:
             t = datetime.fromtimestamp(n.get("providerPublishTime", 0))
@@ -41,7 +43,7 @@ def get_news_from_google(company_name, limit=10):
         query = f"{company_name} saham Indonesia".replace(" ", "+")
         url = f"https://news.google.com/search?q={query}&hl=id&gl=ID&ceid=ID:id"
         headers = {"User-Agent": "Mozilla/5.0"}
-        r = requests.get(url, headers=headers, timeout=10)
+        r = http_get(url, headers=headers, timeout=10)
         if r.status_code != 200:
             return []
         soup = BeautifulSoup(r.content, "html.parser")
@@ -1,9 +1,19 @@
 import yfinance as yf
 import pandas as pd
+import numpy as np
+import os
 import traceback
+import time
 from datetime import datetime
 
+from pembatas_upstream import panggil_yfinance, frame_kosong
+from benchmark_sektor import ambil_benchmark, perbarui_emiten
+from analisis_teknikal import ambil_histori
+from cache_bersama import ambil_objek, simpan_objek
+
 # === Database Rata-Rata Sektor dari IDX ===
+# Tabel statis ini menjadi fallback; jika universe yang ter-cache sudah cukup,
+# benchmark diambil live dari benchmark_sektor (median per sektor).
 SECTOR_RATIOS = {
     'A. Energy': {'PER': 13.14, 'PBV': 3.63, 'DER': 0.57},
     'B. Basic Materials': {'PER': 14.04, 'PBV': 2.77, 'DER': 0.62},
@@ -36,6 +46,48 @@ YFINANCE_TO_IDX_SECTOR = {
     'Transportation': 'K. Transportation & Logistic'
 }
 
+# === Key Laporan Keuangan yfinance (dicoba berurutan) ===
+EQUITY_KEYS = ['Stockholder Equity', 'Total Equity Gross Minority Interest', 'Total Stockholder Equity']
+DEBT_KEYS = ['Total Debt', 'Total Liabilities Net Minority Interest']
+NET_INCOME_KEYS = ['Net Income Common Stockholders', 'Net Income To Common Stockholders', 'Net Income']
+SHARES_KEYS = ['Ordinary Shares Number', 'Share Issued']
+
+# === Cache Laporan Keuangan & Info Ticker ===
+# Dipakai bersama oleh snapshot fundamental dan mode histori agar laporan cukup diunduh sekali.
+# Disimpan di cache bersama sehingga semua worker gunicorn memakai unduhan yang sama.
+TTL_LAPORAN = 6 * 60 * 60
+TTL_INFO = 15 * 60
+
+def ambil_info(ticker_symbol, maks_umur=TTL_INFO):
+    """Snapshot ticker.info; memakai cache jika umurnya belum melewati `maks_umur` detik."""
+    entri = ambil_objek('info', ticker_symbol)
+    if entri is not None and time.time() - entri[0] < maks_umur:
+        return entri[1]
+    info = panggil_yfinance(lambda: yf.Ticker(ticker_symbol).info, kosong=lambda i: not i or i.get('regularMarketPrice') is None)
+    if info and info.get('regularMarketPrice') is not None:
+        simpan_objek('info', ticker_symbol, info)
+    return info
+
+def ambil_laporan_keuangan(ticker_symbol, maks_umur=TTL_LAPORAN):
+    """
+    Mengambil seluruh histori laporan keuangan (neraca & laba rugi, kuartalan & tahunan).
+    Memakai cache jika umurnya belum melewati `maks_umur` detik (0 = paksa ambil ulang).
+    """
+    entri = ambil_objek('laporan', ticker_symbol)
+    if entri is not None and time.time() - entri[0] < maks_umur:
+        return entri[1]
+    ticker = yf.Ticker(ticker_symbol)
+    laporan = {
+        'balance_sheet_q': panggil_yfinance(lambda: ticker.quarterly_balance_sheet, kosong=frame_kosong),
+        'balance_sheet_a': panggil_yfinance(lambda: ticker.balance_sheet, kosong=frame_kosong),
+        'financials_q': panggil_yfinance(lambda: ticker.quarterly_financials, kosong=frame_kosong),
+        'financials_a': panggil_yfinance(lambda: ticker.financials, kosong=frame_kosong),
+    }
+    # Jangan cache hasil kosong (mis. throttling yfinance) agar permintaan berikutnya mencoba lagi
+    if not (frame_kosong(laporan['balance_sheet_q']) and frame_kosong(laporan['balance_sheet_a'])):
+        simpan_objek('laporan', ticker_symbol, laporan)
+    return laporan
+
 # ========= FUNGSI ANALISIS FUNDAMENTAL (UNTUK API) =========
 def get_fundamental_analysis(ticker_symbol):
     """
@@ -59,7 +111,7 @@ def get_fundamental_analysis(ticker_symbol):
     ticker = yf.Ticker(ticker_symbol)
 
     try:
-        info = ticker.info
+        info = ambil_info(ticker_symbol)
         if not info or 'regularMarketPrice' not in info or info.get('regularMarketPrice') is None:
             analysis_log.append(f"❌ Gagal mengambil data fundamental lengkap untuk {ticker_symbol}.")
             analysis_log.append("💡 Pastikan kode ticker benar (contoh: BBCA.JK untuk BCA)")
@@ -96,8 +148,9 @@ def get_fundamental_analysis(ticker_symbol):
         # ==================================
         analysis_log.append("   -> Mengambil Laporan Keuangan (untuk akurasi)...")
         
-        balance_sheet_q = ticker.quarterly_balance_sheet
-        balance_sheet_a = ticker.balance_sheet 
+        laporan = ambil_laporan_keuangan(ticker_symbol)
+        balance_sheet_q = laporan['balance_sheet_q']
+        balance_sheet_a = laporan['balance_sheet_a']
 
         net_income = net_income_info # Default ke data .info
         total_equity = total_equity_info # Default ke data .info
@@ -108,18 +161,21 @@ def get_fundamental_analysis(ticker_symbol):
         total_debt_new = None
         sumber_laporan_income = "Fallback (.info)"
         sumber_laporan_balance = "Fallback (.info)"
+        tanggal_laporan = None
+        if not balance_sheet_q.empty:
+            tanggal_laporan = max(balance_sheet_q.columns).strftime('%Y-%m-%d')
         
         try:
             # Prioritas 1: Coba ambil data TTM
             try:
-                financials_ttm = ticker.financials_ttm
+                financials_ttm = panggil_yfinance(lambda: ticker.financials_ttm)
                 if not financials_ttm.empty and 'Net Income' in financials_ttm.index:
                     net_income_new = financials_ttm.loc['Net Income'].iloc[0]
                     sumber_laporan_income = "TTM"
             except AttributeError:
                 analysis_log.append("   -> Atribut 'financials_ttm' tidak ditemukan.")
                 # Fallback ke data tahunan jika TTM gagal
-                financials_annual = ticker.financials
+                financials_annual = laporan['financials_a']
                 if not financials_annual.empty and 'Net Income To Common Stockholders' in financials_annual.index:
                     net_income_new = financials_annual.loc['Net Income To Common Stockholders'].iloc[0]
                     sumber_laporan_income = "Tahunan Terakhir"
@@ -129,7 +185,7 @@ def get_fundamental_analysis(ticker_symbol):
 
             # Prioritas 1: Ambil Ekuitas Kuartal Terakhir (paling update)
             # Mencoba beberapa kemungkinan key untuk ekuitas
-            equity_keys = ['Stockholder Equity', 'Total Equity Gross Minority Interest', 'Total Stockholder Equity']
+            equity_keys = EQUITY_KEYS
             for key in equity_keys:
                  if not balance_sheet_q.empty and key in balance_sheet_q.index:
                      total_equity_new = balance_sheet_q.loc[key].iloc[0]
@@ -144,7 +200,7 @@ def get_fundamental_analysis(ticker_symbol):
                         break
                 
             # Prioritas 1: Ambil Total Utang Kuartal Terakhir
-            debt_keys = ['Total Debt', 'Total Liabilities Net Minority Interest']
+            debt_keys = DEBT_KEYS
             for key in debt_keys:
                 if not balance_sheet_q.empty and key in balance_sheet_q.index:
                     total_debt_new = balance_sheet_q.loc[key].iloc[0]
@@ -200,6 +256,7 @@ def get_fundamental_analysis(ticker_symbol):
         structured_data["emiten"]["total_equity"] = total_equity
         structured_data["emiten"]["total_debt"] = total_debt
         structured_data["emiten"]["book_value_ps_yfinance"] = book_value_ps
+        structured_data["emiten"]["tanggal_laporan"] = tanggal_laporan
 
 
         # ==================================
@@ -225,23 +282,37 @@ def get_fundamental_analysis(ticker_symbol):
         # LANGKAH 3: TAMPILKAN BENCHMARK
         # ==================================
         avg_per, avg_pbv, avg_der = None, None, None
-        if yfinance_sektor in YFINANCE_TO_IDX_SECTOR:
-            idx_sektor_key = YFINANCE_TO_IDX_SECTOR[yfinance_sektor]
+        idx_sektor_key = YFINANCE_TO_IDX_SECTOR.get(yfinance_sektor)
+        if idx_sektor_key is not None:
             if idx_sektor_key in SECTOR_RATIOS:
-                sektor_data = SECTOR_RATIOS[idx_sektor_key]
+                # Prioritas: median live dari universe ter-cache, fallback per rasio ke tabel statis IDX
+                sektor_statis = SECTOR_RATIOS[idx_sektor_key]
+                sektor_live = ambil_benchmark(idx_sektor_key) or {}
+                sumber_sektor = {}
+                sektor_data = {}
+                for metrik in ('PER', 'PBV', 'DER'):
+                    if sektor_live.get(metrik) is not None:
+                        sektor_data[metrik] = sektor_live[metrik]
+                        sumber_sektor[metrik] = f"Median live ({sektor_live['jumlah_emiten']} emiten)"
+                    else:
+                        sektor_data[metrik] = sektor_statis.get(metrik)
+                        sumber_sektor[metrik] = "Tabel statis IDX"
                 avg_per = sektor_data.get('PER')
                 avg_pbv = sektor_data.get('PBV')
                 avg_der = sektor_data.get('DER')
                 
                 # Simpan data sektor ke dict
-                structured_data["sektor"] = {"nama": idx_sektor_key, "PER": avg_per, "PBV": avg_pbv, "DER": avg_der}
+                structured_data["sektor"] = {"nama": idx_sektor_key, "PER": avg_per, "PBV": avg_pbv, "DER": avg_der,
+                                             "sumber": sumber_sektor}
+                if sektor_live:
+                    structured_data["sektor"]["trimmed_mean"] = {m: sektor_live.get(m + '_trimmed_mean') for m in ('PER', 'PBV', 'DER')}
 
                 analysis_log.append(f"\n📈 BENCHMARK SEKTOR & PASAR")
                 analysis_log.append(f"{'─'*70}")
                 analysis_log.append(f"Rata-rata Sektor ({idx_sektor_key}):")
-                analysis_log.append(f"   • PER : {avg_per:.2f}x")
-                analysis_log.append(f"   • PBV : {avg_pbv:.2f}x")
-                analysis_log.append(f"   • DER : {avg_der:.2f}x")
+                analysis_log.append(f"   • PER : {avg_per:.2f}x ({sumber_sektor['PER']})")
+                analysis_log.append(f"   • PBV : {avg_pbv:.2f}x ({sumber_sektor['PBV']})")
+                analysis_log.append(f"   • DER : {avg_der:.2f}x ({sumber_sektor['DER']})")
                 analysis_log.append(f"\nRata-rata Pasar (IHSG):")
                 analysis_log.append(f"   • PER : {SECTOR_RATIOS['Market PER']:.2f}x")
                 analysis_log.append(f"   • PBV : {SECTOR_RATIOS['Market PBV']:.2f}x")
@@ -495,6 +566,9 @@ def get_fundamental_analysis(ticker_symbol):
         
         analysis_log.append(f"\n{'='*70}")
         analysis_log.append(f"✅ Analisis selesai!")
+
+        # Perbarui agregat sektor secara inkremental dengan rasio emiten ini
+        perbarui_emiten(ticker_symbol, idx_sektor_key, {'PER': per, 'PBV': pbv_final, 'DER': der_final_ratio})
              
         return analysis_log, structured_data, True # Mengembalikan status Sukses
 
@@ -506,72 +580,189 @@ def get_fundamental_analysis(ticker_symbol):
         return analysis_log, structured_data, False # Mengembalikan status Gagal
 
 
-# ========= ENDPOINT API =========
-@app.route('/api/fundamental', methods=['POST'])
-def handle_fundamental_analysis():
+# ========= MODE HISTORI: TIME SERIES RASIO & BAND VALUASI =========
+MIN_HARI_BAND = 60  # Minimal jumlah hari valuasi valid agar band PER/PBV dihitung
+# Jeda publikasi laporan setelah akhir periode (batas waktu IDX: laporan kuartal ~2 bulan,
+# laporan tahunan teraudit ~3 bulan). Angka laporan baru dipakai band setelah jeda ini
+# agar PER/PBV historis tidak memakai data yang belum diumumkan (look-ahead).
+LAG_LAPORAN_HARI = int(os.environ.get('FUNDAMENTAL_LAG_LAPORAN_HARI', '60'))
+LAG_LAPORAN_TAHUNAN_HARI = int(os.environ.get('FUNDAMENTAL_LAG_LAPORAN_TAHUNAN_HARI', '90'))
+
+def _seri_laporan(df, keys):
+    """Mengambil satu baris laporan (key pertama yang ada) sebagai Series numerik terurut per tanggal."""
+    if df is None or df.empty:
+        return None
+    for key in keys:
+        if key in df.index:
+            seri = pd.to_numeric(df.loc[key], errors='coerce')
+            seri.index = pd.to_datetime(seri.index)
+            return seri.sort_index()
+    return None
+
+def _frame_laporan(balance_sheet, financials, ttm):
+    ekuitas = _seri_laporan(balance_sheet, EQUITY_KEYS)
+    if ekuitas is None:
+        return pd.DataFrame(columns=['ekuitas', 'utang', 'saham', 'laba_ttm'])
+    frame = pd.DataFrame({'ekuitas': ekuitas})
+    for kolom, seri in [('utang', _seri_laporan(balance_sheet, DEBT_KEYS)),
+                        ('saham', _seri_laporan(balance_sheet, SHARES_KEYS)),
+                        ('laba_ttm', _seri_laporan(financials, NET_INCOME_KEYS))]:
+        if seri is not None and kolom == 'laba_ttm' and ttm:
+            # Laba kuartalan -> TTM (jumlah 4 kuartal terakhir)
+            seri = seri.rolling(4, min_periods=4).sum()
+        frame[kolom] = seri.reindex(frame.index) if seri is not None else np.nan
+    return frame
+
+def hitung_histori_fundamental(laporan, shares_fallback=None):
     """
-    Endpoint untuk analisis fundamental saham.
-    Menerima JSON: {"ticker": "BBCA"}
-    Mengembalikan analisis lengkap dalam format JSON.
+    Menyusun time series ROE, DER, BVPS, dan EPS dari seluruh kolom laporan.
+    Nilai kuartalan diutamakan; nilai yang kosong (mis. TTM belum genap 4 kuartal) dan
+    tanggal yang hanya ada di laporan tahunan diisi dari laporan tahunan.
     """
-    try:
-        req_data = request.get_json()
-        if not req_data or 'ticker' not in req_data:
-            return jsonify({
-                "status": "error",
-                "message": "Mohon kirim {'ticker': 'KODE_SAHAM'} dalam body JSON."
-            }), 400
-
-        ticker_input = req_data['ticker'].upper()
-        ticker_symbol = ticker_input + ".JK"
-        
-        log_outputs, structured_outputs, success = get_fundamental_analysis(ticker_symbol)
-        final_analysis_text = "\n".join(log_outputs)
-
-        if not success:
-            return jsonify({
-                "status": "error", 
-                "ticker": ticker_input,
-                "analysis_text": final_analysis_text
-                # Tidak menyertakan structured_data jika gagal
-            }), 404 # Atau 500 tergantung errornya
-
-        return jsonify({
-            "status": "success",
-            "ticker": ticker_input,
-            "analysis_text": final_analysis_text,
-            "structured_data": structured_outputs
-        })
-
-    except Exception as e:
-        print(f"Internal server error: {e}") # Log error ke server
-        # traceback.print_exc() # Bisa ditambahkan untuk detail di log server
-        return jsonify({
-            "status": "error",
-            "message": f"Error internal server: Terjadi kesalahan tak terduga."
-            # Jangan tampilkan detail error ke user
-        }), 500
-
-
-@app.route('/', methods=['GET'])
-def home():
-    """Endpoint untuk mengetes apakah server aktif."""
-    return jsonify({
-        "status": "active",
-        "message": "Server Analisis Fundamental Aktif",
-        "endpoints": {
-            "/api/fundamental": "POST - Analisis fundamental saham (body: {'ticker': 'KODE_SAHAM'})"
+    kuartal = _frame_laporan(laporan['balance_sheet_q'], laporan['financials_q'], ttm=True).astype(float)
+    tahunan = _frame_laporan(laporan['balance_sheet_a'], laporan['financials_a'], ttm=False).astype(float)
+    histori = kuartal.combine_first(tahunan).sort_index()
+    if shares_fallback:
+        histori['saham'] = histori['saham'].fillna(float(shares_fallback))
+
+    ekuitas_positif = histori['ekuitas'].where(histori['ekuitas'] > 0)
+    saham_positif = histori['saham'].where(histori['saham'] > 0)
+    histori['ROE'] = histori['laba_ttm'] / ekuitas_positif
+    histori['DER'] = histori['utang'] / ekuitas_positif
+    histori['BVPS'] = histori['ekuitas'] / saham_positif
+    histori['EPS'] = histori['laba_ttm'] / saham_positif
+    return histori
+
+def _nilai_berlaku(fundamental, kolom, posisi):
+    """Nilai `kolom` laporan terakhir yang berlaku di tiap posisi (-1 = belum ada laporan)."""
+    nilai = fundamental[kolom].to_numpy(dtype=float)
+    if len(nilai) == 0:
+        return np.full(len(posisi), np.nan)
+    return np.where(posisi >= 0, nilai[np.maximum(posisi, 0)], np.nan)
+
+def _tanggal_publikasi(tanggal_periode):
+    """Perkiraan tanggal laporan diumumkan: akhir periode + jeda (Desember = laporan tahunan)."""
+    lag = np.where(tanggal_periode.month == 12, LAG_LAPORAN_TAHUNAN_HARI, LAG_LAPORAN_HARI)
+    return tanggal_periode + pd.to_timedelta(lag, unit='D')
+
+def hitung_band_valuasi(close, histori):
+    """
+    Menyelaraskan harga harian dengan EPS/BVPS terakhir yang sudah dipublikasikan (akhir periode
+    laporan + jeda publikasi) lalu menghitung seri PER/PBV harian beserta band mean ± 1/2 std.
+    `close` boleh berupa view read-only dari cache bersama; harga dibaca tanpa disalin.
+    """
+    # Periode tanpa TTM (kuartal belum genap 4) memakai EPS terakhir yang sudah dilaporkan
+    fundamental = histori[['EPS', 'BVPS']].ffill().dropna(how='all')
+    fundamental.index = _tanggal_publikasi(fundamental.index)
+    fundamental = fundamental.sort_index()
+    # Posisi laporan terakhir yang sudah terbit per hari bursa (setara merge_asof backward)
+    posisi = np.searchsorted(fundamental.index.to_numpy(dtype='datetime64[ns]'),
+                             close.index.to_numpy(dtype='datetime64[ns]'), side='right') - 1
+    harga = close.to_numpy()
+    eps = _nilai_berlaku(fundamental, 'EPS', posisi)
+    bvps = _nilai_berlaku(fundamental, 'BVPS', posisi)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        seri = pd.DataFrame({
+            'PER': np.where(eps > 0, harga / eps, np.nan),
+            'PBV': np.where(bvps > 0, harga / bvps, np.nan),
+        }, index=close.index)
+
+    band = {}
+    for rasio in ('PER', 'PBV'):
+        nilai = seri[rasio].dropna()
+        if len(nilai) < MIN_HARI_BAND:
+            band[rasio] = None
+            continue
+        rata, std = nilai.mean(), nilai.std()
+        sekarang = seri[rasio].iloc[-1]
+        z = (sekarang - rata) / std if std > 0 and not pd.isna(sekarang) else None
+        if z is None: posisi = "Tidak tersedia"
+        elif z <= -2: posisi = "Sangat murah secara historis (di bawah -2 std)"
+        elif z <= -1: posisi = "Murah secara historis (di bawah -1 std)"
+        elif z < 1: posisi = "Wajar (dalam ±1 std)"
+        elif z < 2: posisi = "Mahal secara historis (di atas +1 std)"
+        else: posisi = "Sangat mahal secara historis (di atas +2 std)"
+        band[rasio] = {
+            "sekarang": sekarang, "mean": rata, "std": std, "z_score": z, "posisi": posisi,
+            "minus_2std": rata - 2 * std, "minus_1std": rata - std,
+            "plus_1std": rata + std, "plus_2std": rata + 2 * std,
+            "jumlah_hari": len(nilai),
+            "sejak": nilai.index[0].strftime('%Y-%m-%d'),
         }
-    })
-
+    return seri, band
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint untuk monitoring."""
-    return jsonify({"status": "healthy"}), 200
+def get_fundamental_history(ticker_symbol):
+    """
+    Mode histori fundamental: time series ROE/DER/BVPS/EPS dari seluruh laporan yang
+    sudah diunduh, plus band valuasi PER/PBV (mean ± std) terhadap harga harian 5 tahun.
+    Mengembalikan hasilnya sebagai (list_of_strings, structured_dict, success_status).
+    """
+    analysis_log = [f"🔍 Mengambil histori fundamental untuk: {ticker_symbol}..."]
+    try:
+        laporan = ambil_laporan_keuangan(ticker_symbol)
+        if frame_kosong(laporan['balance_sheet_q']) and frame_kosong(laporan['balance_sheet_a']):
+            analysis_log.append(f"❌ Laporan keuangan {ticker_symbol} tidak tersedia.")
+            return analysis_log, {}, False
+
+        shares_fallback = None
+        if _seri_laporan(laporan['balance_sheet_q'], SHARES_KEYS) is None:
+            info = ambil_info(ticker_symbol)
+            shares_fallback = (info or {}).get('sharesOutstanding')
+        histori = hitung_histori_fundamental(laporan, shares_fallback)
+
+        data_harga = ambil_histori(ticker_symbol, period="5y", interval="1d", salin=False)
+        if data_harga.empty or histori.empty:
+            analysis_log.append("❌ Data harga / laporan tidak cukup untuk menghitung band valuasi.")
+            return analysis_log, {}, False
+        close = data_harga['Close']
+        index = close.index.tz_localize(None) if close.index.tz is not None else close.index
+        close = close.set_axis(index.normalize())  # tetap view mmap, tanpa salinan
+
+        seri_valuasi, band = hitung_band_valuasi(close, histori)
+
+        # Seri valuasi dikirim mingguan agar payload tetap ringkas
+        mingguan = seri_valuasi.resample('W').last().dropna(how='all')
+        structured_data = {
+            "tanggal_laporan": histori.index[-1].strftime('%Y-%m-%d'),
+            "harga": float(close.iloc[-1]),
+            "histori_fundamental": [
+                {"tanggal": tanggal.strftime('%Y-%m-%d'), "ROE": baris['ROE'], "DER": baris['DER'],
+                 "BVPS": baris['BVPS'], "EPS": baris['EPS']}
+                for tanggal, baris in histori.iterrows()
+            ],
+            "band_valuasi": band,
+            "seri_valuasi_mingguan": [
+                {"tanggal": tanggal.strftime('%Y-%m-%d'), "PER": baris['PER'], "PBV": baris['PBV']}
+                for tanggal, baris in mingguan.iterrows()
+            ],
+        }
 
+        analysis_log.append(f"\n📊 HISTORI FUNDAMENTAL ({len(histori)} periode laporan)")
+        analysis_log.append(f"{'='*70}")
+        for tanggal, baris in histori.iterrows():
+            roe = f"{baris['ROE']*100:.2f}%" if not pd.isna(baris['ROE']) else "-"
+            der = f"{baris['DER']:.2f}x" if not pd.isna(baris['DER']) else "-"
+            bvps = f"Rp {baris['BVPS']:,.2f}" if not pd.isna(baris['BVPS']) else "-"
+            eps = f"Rp {baris['EPS']:,.2f}" if not pd.isna(baris['EPS']) else "-"
+            analysis_log.append(f"   {tanggal.strftime('%Y-%m-%d')}: ROE {roe} | DER {der} | BVPS {bvps} | EPS {eps}")
+
+        for rasio, b in band.items():
+            analysis_log.append(f"\n📈 BAND {rasio}")
+            analysis_log.append(f"{'─'*70}")
+            if b is None:
+                analysis_log.append(f"   ❌ Data {rasio} historis tidak cukup")
+                continue
+            analysis_log.append(f"   • Sekarang : {b['sekarang']:.2f}x")
+            analysis_log.append(f"   • Mean     : {b['mean']:.2f}x (sejak {b['sejak']})")
+            analysis_log.append(f"   • -1/+1 std: {b['minus_1std']:.2f}x / {b['plus_1std']:.2f}x")
+            analysis_log.append(f"   • -2/+2 std: {b['minus_2std']:.2f}x / {b['plus_2std']:.2f}x")
+            analysis_log.append(f"   💬 {b['posisi']}")
 
-# if __name__ == '__main__':
-#     # Baris ini HANYA untuk testing lokal, JANGAN aktifkan di Vercel/Render
-#     app.run(debug=True, host='0.0.0.0', port=5000)
+        analysis_log.append(f"\n{'='*70}")
+        analysis_log.append(f"✅ Analisis histori selesai!")
+        return analysis_log, structured_data, True
 
+    except Exception as e:
+        analysis_log.append(f"\n❌ Terjadi error saat memproses histori {ticker_symbol}: {e}")
+        print(f"Error histori for {ticker_symbol}: {e}")
+        return analysis_log, {}, False
@@ -0,0 +1,170 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analisis_teknikal import ambil_histori
+from cache_bersama import ambil_objek, simpan_objek
+
+# === Universe Default: LQ45 ===
+UNIVERSE_LQ45 = [
+    'ACES', 'ADRO', 'AKRA', 'AMMN', 'AMRT', 'ANTM', 'ARTO', 'ASII', 'BBCA', 'BBNI',
+    'BBRI', 'BBTN', 'BMRI', 'BRIS', 'BRPT', 'CPIN', 'CTRA', 'ESSA', 'EXCL', 'GOTO',
+    'ICBP', 'INCO', 'INDF', 'INKP', 'ISAT', 'ITMG', 'JPFA', 'JSMR', 'KLBF', 'MAPA',
+    'MAPI', 'MBMA', 'MDKA', 'MEDC', 'PGAS', 'PGEO', 'PTBA', 'SIDO', 'SMGR', 'SMRA',
+    'TLKM', 'TOWR', 'UNTR', 'UNVR', 'BUKA',
+]
+BENCHMARK_DEFAULT = '^JKSE'  # IHSG
+
+# Jendela return (hari bursa) dan bobot skor relative strength gabungan
+JENDELA_RETURN = {'1m': 21, '3m': 63, '6m': 126}
+BOBOT_RS = {'1m': 0.2, '3m': 0.4, '6m': 0.4}
+HARI_KORELASI = 63
+JUMLAH_PASANGAN_KORELASI = 10
+MAX_WORKERS_HISTORI = 8
+
+# Hasil ranking disimpan di cache bersama (dipakai semua worker), hanya hari bursa terakhir:
+# (tickers, benchmark) -> (tanggal_bar, log, data)
+
+
+# === Fungsi Pembantu ===
+def _ambil_close(ticker_symbol):
+    # Sumber histori yang sama dengan get_technical_analysis (period 2y, harian);
+    # hanya Close yang dibaca: nilainya tetap view mmap cache bersama sampai disusun
+    # menjadi matriks universe (satu-satunya salinan)
+    data = ambil_histori(ticker_symbol, period="2y", interval="1d", salin=False)
+    if data.empty:
+        return None
+    close = data['Close']
+    index = close.index.tz_localize(None) if close.index.tz is not None else close.index
+    index = index.normalize()
+    if index.has_duplicates:
+        # Jarang (bar intraday hari ini ikut terbawa): ambil bar terakhir per tanggal
+        return close.set_axis(index).groupby(level=0).last()
+    return close.set_axis(index)
+
+
+def _peringkat(nilai):
+    """Peringkat 1..N (1 = nilai terbesar); NaN mendapat peringkat paling bawah."""
+    urutan = np.argsort(np.where(np.isnan(nilai), -np.inf, nilai))[::-1]
+    peringkat = np.empty(len(nilai), dtype=int)
+    peringkat[urutan] = np.arange(1, len(nilai) + 1)
+    return peringkat
+
+
+def hitung_ranking(closes, kolom_benchmark):
+    """
+    Menghitung return bergulir, relative strength terhadap benchmark, peringkat,
+    dan matriks korelasi dalam satu kali lintasan NumPy atas matriks close (T x N).
+    """
+    kode = [k for k in closes.columns if k != kolom_benchmark]
+    matriks = closes[kode].to_numpy(dtype=float)
+    benchmark = closes[kolom_benchmark].to_numpy(dtype=float)
+
+    returns, rs = {}, {}
+    jumlah_skor = np.zeros(len(kode))
+    jumlah_bobot = np.zeros(len(kode))
+    for nama, hari in JENDELA_RETURN.items():
+        if len(matriks) <= hari:
+            returns[nama] = np.full(len(kode), np.nan)
+            rs[nama] = np.full(len(kode), np.nan)
+            continue
+        returns[nama] = matriks[-1] / matriks[-1 - hari] - 1
+        return_benchmark = benchmark[-1] / benchmark[-1 - hari] - 1
+        rs[nama] = (1 + returns[nama]) / (1 + return_benchmark) - 1
+        ada = ~np.isnan(rs[nama])
+        jumlah_skor += np.where(ada, BOBOT_RS[nama] * rs[nama], 0.0)
+        jumlah_bobot += np.where(ada, BOBOT_RS[nama], 0.0)
+    # Skor = rata-rata berbobot jendela yang tersedia; tanpa histori 3 bulan skor NaN
+    # (saham baru listing tidak dinilai netral, tetapi ditaruh di peringkat paling bawah)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        skor = jumlah_skor / jumlah_bobot
+    skor[np.isnan(rs['3m'])] = np.nan
+    peringkat = _peringkat(skor)
+
+    # Korelasi return log harian; saham dengan data bolong di jendela ini dikeluarkan
+    jendela = matriks[-(HARI_KORELASI + 1):]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return_log = np.diff(np.log(jendela), axis=0)
+    lengkap = ~np.isnan(return_log).any(axis=0) & (np.nanstd(return_log, axis=0) > 0)
+    kode_korelasi = [k for k, ok in zip(kode, lengkap) if ok]
+    korelasi = np.corrcoef(return_log[:, lengkap], rowvar=False) if len(kode_korelasi) > 1 else np.ones((len(kode_korelasi),) * 2)
+
+    baris, kolom = np.triu_indices(len(kode_korelasi), k=1)
+    nilai_pasangan = korelasi[baris, kolom] if len(baris) else np.array([])
+    teratas = np.argsort(nilai_pasangan)[::-1][:JUMLAH_PASANGAN_KORELASI]
+    pasangan = [{"ticker_a": kode_korelasi[baris[i]], "ticker_b": kode_korelasi[kolom[i]],
+                 "korelasi": float(nilai_pasangan[i])} for i in teratas]
+
+    ranking = []
+    for i, k in enumerate(kode):
+        baris_ranking = {"ticker": k, "peringkat": int(peringkat[i]), "skor_rs": float(skor[i]),
+                         "outperform_benchmark": bool(rs['3m'][i] > 0) if not np.isnan(rs['3m'][i]) else None}
+        for nama in JENDELA_RETURN:
+            baris_ranking[f"return_{nama}"] = float(returns[nama][i])
+            baris_ranking[f"rs_{nama}"] = float(rs[nama][i])
+        ranking.append(baris_ranking)
+    ranking.sort(key=lambda r: r["peringkat"])
+
+    return {
+        "ranking": ranking,
+        "korelasi": {"tickers": kode_korelasi, "matriks": korelasi.tolist(), "hari": HARI_KORELASI,
+                     "pasangan_teratas": pasangan},
+    }
+
+
+# === FUNGSI UTAMA RANKING ===
+def get_ranking_analysis(daftar_kode=None, benchmark=BENCHMARK_DEFAULT):
+    """
+    Relative strength & korelasi lintas universe (default LQ45) terhadap benchmark (default IHSG).
+    Hasil di-cache per hari bursa (tanggal bar terakhir benchmark).
+    Mengembalikan (list_of_strings, structured_dict, success_status).
+    """
+    analysis_log = []
+    try:
+        daftar_kode = sorted({k.upper() for k in (daftar_kode or UNIVERSE_LQ45)})
+        close_benchmark = _ambil_close(benchmark)
+        if close_benchmark is None:
+            analysis_log.append(f"Gagal mengambil data benchmark {benchmark}.")
+            return analysis_log, {}, False
+
+        kunci = (tuple(daftar_kode), benchmark)
+        tanggal = close_benchmark.index[-1].strftime('%Y-%m-%d')
+        entri = ambil_objek('ranking', kunci)
+        if entri is not None and entri[1][0] == tanggal:
+            _, log, data = entri[1]
+            return list(log), data, True
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS_HISTORI) as eksekutor:
+            semua_close = dict(zip(daftar_kode, eksekutor.map(lambda k: _ambil_close(k + ".JK"), daftar_kode)))
+        gagal = [k for k, c in semua_close.items() if c is None]
+        semua_close = {k: c for k, c in semua_close.items() if c is not None}
+        if len(semua_close) < 2:
+            analysis_log.append("Gagal mengambil data histori untuk universe.")
+            return analysis_log, {}, False
+
+        # Satukan semua close menjadi satu matriks yang sejajar dengan kalender benchmark
+        closes = pd.concat(semua_close, axis=1).reindex(close_benchmark.index).ffill(limit=3)
+        closes[benchmark] = close_benchmark
+        data = hitung_ranking(closes, benchmark)
+        data.update({"benchmark": benchmark, "tanggal": tanggal, "ticker_gagal": gagal})
+
+        analysis_log.append(f"Relative strength {len(semua_close)} saham terhadap {benchmark} (per {tanggal})")
+        if gagal:
+            analysis_log.append(f"⚠️  Data tidak tersedia: {', '.join(gagal)}")
+        analysis_log.append("\n🟢 TOP 5 RELATIVE STRENGTH:")
+        for r in data["ranking"][:5]:
+            analysis_log.append(f"   {r['peringkat']}. {r['ticker']}: RS 3M {r['rs_3m'] * 100:+.1f}%, Return 3M {r['return_3m'] * 100:+.1f}%")
+        analysis_log.append("\n🔴 BOTTOM 5 RELATIVE STRENGTH:")
+        for r in data["ranking"][-5:]:
+            analysis_log.append(f"   {r['peringkat']}. {r['ticker']}: RS 3M {r['rs_3m'] * 100:+.1f}%, Return 3M {r['return_3m'] * 100:+.1f}%")
+        analysis_log.append(f"\n🔗 PASANGAN PALING BERKORELASI ({HARI_KORELASI} hari):")
+        for p in data["korelasi"]["pasangan_teratas"][:5]:
+            analysis_log.append(f"   {p['ticker_a']} - {p['ticker_b']}: {p['korelasi']:.2f}")
+
+        simpan_objek('ranking', kunci, (tanggal, list(analysis_log), data))
+        return analysis_log, data, True
+
+    except Exception as e:
+        analysis_log.append(f"Terjadi error ranking: {e}")
+        return analysis_log, {}, False
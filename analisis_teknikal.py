@@ -5,6 +5,14 @@ import numpy as np
 import traceback
 import io
 
+from pembatas_upstream import panggil_yfinance, frame_kosong
+from cache_bersama import ambil_frame, simpan_frame
+
+# === Cache Histori Harga ===
+# Sumber histori bersama untuk analisis teknikal, grafik, dan fitur lain berbasis harga.
+# Disimpan di cache bersama (mmap) sehingga satu unduhan dipakai semua worker gunicorn.
+TTL_HISTORI = 15 * 60
+
 # === Fungsi Pembantu ===
 def bulatkan_fraksi(harga):
     if harga is None: return None
@@ -86,12 +94,48 @@ def interpretasi_fibonacci(current_price, fib_levels):
         output_lines.append("   -> Harga DI BAWAH swing low (Breakdown Bearish)")
     return output_lines
 
+def ambil_histori(ticker_symbol_with_jk, period="2y", interval="1d", maks_umur=TTL_HISTORI, salin=True):
+    """
+    Mengambil histori OHLCV dari yfinance (lewat rate limiter), memakai cache jika
+    umurnya belum melewati `maks_umur` detik. maks_umur=0 memaksa ambil ulang.
+    salin=True : salinan DataFrame (aman ditambah kolom indikator oleh pemanggil).
+    salin=False: DataFrame read-only (float64) yang dibaca zero-copy dari cache bersama,
+                 untuk pemanggil yang hanya membaca kolom (mis. Close).
+    """
+    kunci = (ticker_symbol_with_jk, period, interval)
+    if maks_umur > 0:
+        data = ambil_frame('histori', kunci, maks_umur, salin=salin)
+        if data is not None:
+            return data
+    data = panggil_yfinance(lambda: yf.Ticker(ticker_symbol_with_jk).history(period=period, interval=interval), kosong=frame_kosong)
+    if not data.empty:
+        simpan_frame('histori', kunci, data)
+    return data
+
+def hitung_indikator(data):
+    """Menambahkan kolom MACD, RSI, Stoch RSI, MFI, dan Pivot Auto 15 ke `data`; mengembalikan level Fibonacci."""
+    data.ta.macd(append=True)
+    data.ta.rsi(length=14, append=True)
+    data.ta.stochrsi(append=True)
+    data.ta.mfi(length=14, append=True)
+    
+    pivot_list, r1_list, r2_list, s1_list, s2_list = hitung_pivot_points_auto(data)
+    data['P_auto15'], data['R1_auto15'], data['S1_auto15'], data['R2_auto15'], data['S2_auto15'] = pivot_list, r1_list, s1_list, r2_list, s2_list
+    
+    return hitung_fibonacci(data)
+
 # === FUNGSI UTAMA TEKNIKAL ===
-def get_technical_analysis(ticker_symbol_with_jk):
+def get_technical_analysis(ticker_symbol_with_jk, data=None):
     analysis_log = []
     try:
         analysis_log.append(f"Mengambil data teknikal untuk: {ticker_symbol_with_jk}")
-        data = yf.Ticker(ticker_symbol_with_jk).history(period="2y", interval="1d")
+        if data is None:
+            # Histori yang baru diambil worker lain (grafik, ranking, evaluator webhook) dipakai
+            # ulang dari cache bersama; salinannya boleh ditambah kolom indikator
+            data = ambil_histori(ticker_symbol_with_jk, period="2y", interval="1d")
+        else:
+            # Histori 2y/1d yang sudah diambil pemanggil (mis. evaluator webhook)
+            data = data.copy()
         if data.empty:
             analysis_log.append("Gagal mengambil data.")
             return analysis_log, {}, False
@@ -99,15 +143,7 @@ def get_technical_analysis(ticker_symbol_with_jk):
 
         # Hitung Indikator
         analysis_log.append("⏳ Menghitung indikator teknikal...")
-        data.ta.macd(append=True)
-        data.ta.rsi(length=14, append=True)
-        data.ta.stochrsi(append=True)
-        data.ta.mfi(length=14, append=True)
-        
-        pivot_list, r1_list, r2_list, s1_list, s2_list = hitung_pivot_points_auto(data)
-        data['P_auto15'], data['R1_auto15'], data['S1_auto15'], data['R2_auto15'], data['S2_auto15'] = pivot_list, r1_list, s1_list, r2_list, s2_list
-        
-        fib_levels, swing_high, swing_low = hitung_fibonacci(data)
+        fib_levels, swing_high, swing_low = hitung_indikator(data)
         
         # Analisis Data Terakhir
         data_bersih = data.dropna()
@@ -174,6 +210,7 @@ def get_technical_analysis(ticker_symbol_with_jk):
         if current_close > fib_levels.get('1.0 (High)', float('inf')): sinyal_bullish += 1
         
         if sinyal_bullish > sinyal_bearish:
+            sinyal = "BULLISH"
             analysis_log.append("🟢 SINYAL: BULLISH (Pertimbangkan BUY)")
             # (Logika target & support disalin di sini)
             if current_close > fib_levels['1.0 (High)']:
@@ -186,13 +223,21 @@ def get_technical_analysis(ticker_symbol_with_jk):
                 analysis_log.append(f"   Support : Fib 0.618 ({fib_levels.get('0.618 (Golden)'):.0f}) / Fib 0.500 ({fib_levels.get('0.500'):.0f})")
                 analysis_log.append(f"   Target 2: High 1.0 ({fib_levels.get('1.0 (High)'):.0f})")
         elif sinyal_bearish > sinyal_bullish:
+            sinyal = "BEARISH"
             analysis_log.append("🔴 SINYAL: BEARISH (Pertimbangkan SELL/Hindari)")
         else:
+            sinyal = "NETRAL"
             analysis_log.append("⚪ SINYAL: NETRAL (Tunggu Konfirmasi)")
 
         analysis_log.append("\n⚠️  DISCLAIMER: Ini bukan saran investasi resmi.")
         
-        return analysis_log, last_data.to_dict(), True
+        indikator_terakhir = last_data.to_dict()
+        # Versi data (dipakai untuk ETag): tanggal bar terakhir dari data mentah
+        indikator_terakhir['tanggal_bar'] = data.index[-1].strftime('%Y-%m-%d')
+        indikator_terakhir['harga_terakhir'] = current_close
+        indikator_terakhir['sinyal'] = sinyal
+        indikator_terakhir['fibonacci'] = fib_levels
+        return analysis_log, indikator_terakhir, True
 
     except Exception as e:
         analysis_log.append(f"Terjadi error teknikal: {e}")
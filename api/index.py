@@ -1,4 +1,5 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import sys
 import os
 
@@ -7,13 +8,57 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # -----------------------------------------------------------
 
-# Impor fungsi-fungsi dari file logika Anda
-from analisis_fundamental import get_fundamental_analysis
-from analisis_teknikal import get_technical_analysis
+# Impor fungsi-fungsi dari file logika Anda (melalui cache hasil analisis)
+from cache_analisis import jalankan_analisis_swr, hitung_etag, sisa_ttl, metrik_cache
+from pembatas_upstream import status_breaker
+from penjadwal_prefetch import mulai_penjadwal
+from serialisasi import respons_json, respons_ndjson
+from grafik_teknikal import get_chart_png
+from analisis_ranking import get_ranking_analysis
+import profiler_request
+from langganan_sinyal import KONDISI, mulai_evaluator, tambah_langganan, daftar_langganan, hapus_langganan
+import langganan_sinyal
+from penyimpanan_hasil import query_histori, statistik as statistik_penyimpanan
 
 # Inisialisasi Flask App
 app = Flask(__name__)
 
+# Prefetch watchlist di background (aktif hanya jika PREFETCH_WATCHLIST diisi)
+mulai_penjadwal()
+# Evaluator webhook perubahan sinyal (hanya satu worker yang benar-benar mengevaluasi)
+mulai_evaluator()
+
+# === PROFILING ON-DEMAND (header X-Profile: 1 + X-Admin-Token) ===
+@app.before_request
+def _mulai_profil_jika_diminta():
+    if profiler_request.diminta(request):
+        g.profil = profiler_request.mulai_profil()
+
+@app.after_request
+def _selesai_profil(response):
+    state = g.pop('profil', None)
+    if state is not None:
+        id_profil, durasi_ms, jumlah_sampel = profiler_request.selesai_profil(state, f"{request.method} {request.full_path}")
+        response.headers['X-Profile-Id'] = id_profil
+        response.headers['X-Profile-Url'] = f"/api/profile/{id_profil}"
+        response.headers['X-Profile-Samples'] = str(jumlah_sampel)
+        response.headers['X-Profile-Duration-Ms'] = f"{durasi_ms:.1f}"
+    return response
+
+@app.route('/api/profile/<id_profil>', methods=['GET'])
+def handle_profil(id_profil):
+    """Profil collapsed-stack (flamegraph.pl / speedscope) untuk satu request yang diprofil."""
+    if not profiler_request.token_valid(request.headers.get('X-Admin-Token')):
+        return jsonify({"status": "error", "message": "Token admin tidak valid"}), 403
+    isi = profiler_request.baca_profil(id_profil)
+    if isi is None:
+        return jsonify({"status": "error", "message": f"Profil '{id_profil}' tidak ditemukan"}), 404
+    return app.response_class(isi, mimetype='text/plain')
+
+def _kode_status_gagal(meta):
+    # 503 jika gagal karena circuit breaker upstream terbuka, selain itu 404 seperti sebelumnya
+    return 503 if meta.get("sumber") == "breaker_terbuka" else 404
+
 # === ENDPOINT 1: FUNDAMENTAL ===
 @app.route('/api/fundamental', methods=['POST'])
 def handle_fundamental():
@@ -24,18 +69,21 @@ def handle_fundamental():
         
         ticker_input = req_data['ticker'].upper()
         ticker_symbol_jk = ticker_input + ".JK"
+        # mode "histori": time series rasio + band valuasi PER/PBV
+        jenis = 'fundamental_histori' if req_data.get('mode') == 'histori' else 'fundamental'
         
         # Panggil fungsi dari file fundamental
-        log, data, success = get_fundamental_analysis(ticker_symbol_jk)
+        (log, data, success), meta = jalankan_analisis_swr(jenis, ticker_symbol_jk)
         
         if not success:
-            return jsonify({"status": "error", "ticker": ticker_input, "analysis_text": "\n".join(log)}), 404
+            return jsonify({"status": "error", "ticker": ticker_input, "analysis_text": "\n".join(log)}), _kode_status_gagal(meta)
             
-        return jsonify({
+        return respons_json({
             "status": "success",
             "ticker": ticker_input,
             "analysis_text": "\n".join(log),
-            "structured_data": data
+            "structured_data": data,
+            "cache": meta
         })
 
     except Exception as e:
@@ -53,24 +101,23 @@ def handle_teknikal():
         ticker_symbol_jk = ticker_input + ".JK"
 
         # Panggil fungsi dari file teknikal
-        log, data, success = get_technical_analysis(ticker_symbol_jk)
+        (log, data, success), meta = jalankan_analisis_swr('teknikal', ticker_symbol_jk)
 
         if not success:
-            return jsonify({"status": "error", "ticker": ticker_input, "analysis_text": "\n".join(log)}), 404
+            return jsonify({"status": "error", "ticker": ticker_input, "analysis_text": "\n".join(log)}), _kode_status_gagal(meta)
 
-        return jsonify({
+        return respons_json({
             "status": "success",
             "ticker": ticker_input,
             "analysis_text": "\n".join(log),
-            "last_indicators": data
+            "last_indicators": data,
+            "cache": meta
         })
 
     except Exception as e:
         return jsonify({"status": "error", "message": f"Internal server error: {e}"}), 500
 
 # === ENDPOINT 3: SENTIMEN ===
-from analisis_sentimen import get_sentiment_analysis
-
 @app.route('/api/sentimen', methods=['POST'])
 def handle_sentimen():
     try:
@@ -81,22 +128,276 @@ def handle_sentimen():
         ticker_input = req_data['ticker'].upper()
         ticker_symbol_jk = ticker_input + ".JK"
 
-        log, data, success = get_sentiment_analysis(ticker_symbol_jk)
+        (log, data, success), meta = jalankan_analisis_swr('sentimen', ticker_symbol_jk)
         if not success:
-            return jsonify({"status": "error", "ticker": ticker_input, "analysis_text": "\n".join(log)}), 404
+            return jsonify({"status": "error", "ticker": ticker_input, "analysis_text": "\n".join(log)}), _kode_status_gagal(meta)
 
-        return jsonify({
+        return respons_json({
             "status": "success",
             "ticker": ticker_input,
             "analysis_text": "\n".join(log),
-            "structured_data": data
+            "structured_data": data,
+            "cache": meta
         })
     except Exception as e:
         return jsonify({"status": "error", "message": f"Internal server error: {e}"}), 500
 
 
+# === ENDPOINT GET (CACHEABLE): /api/<jenis>/<KODE> ===
+# Mendukung ETag + If-None-Match (304 Not Modified) dan Cache-Control,
+# sehingga polling n8n / reverse proxy tidak perlu menerima payload yang sama berulang kali.
+KUNCI_DATA = {
+    'teknikal': 'last_indicators',
+    'fundamental': 'structured_data',
+    'fundamental_histori': 'structured_data',
+    'sentimen': 'structured_data',
+}
+
+@app.route('/api/<jenis>/<kode>', methods=['GET'])
+def handle_analisis_get(jenis, kode):
+    if jenis not in KUNCI_DATA:
+        return jsonify({"status": "error", "message": f"Jenis analisis '{jenis}' tidak dikenal"}), 404
+    try:
+        ticker_input = kode.upper()
+        ticker_symbol_jk = ticker_input + ".JK"
+
+        (log, data, success), meta = jalankan_analisis_swr(jenis, ticker_symbol_jk)
+        if not success:
+            return jsonify({"status": "error", "ticker": ticker_input, "analysis_text": "\n".join(log)}), _kode_status_gagal(meta)
+
+        etag = hitung_etag(jenis, ticker_symbol_jk, data)
+        cache_control = f"public, max-age={sisa_ttl(jenis, ticker_symbol_jk)}"
+
+        # Cek kondisional sebelum membangun payload agar 304 tidak perlu serialisasi
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            response = respons_json({
+                "status": "success",
+                "ticker": ticker_input,
+                "analysis_text": "\n".join(log),
+                KUNCI_DATA[jenis]: data,
+                "cache": meta
+            })
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        if meta.get("umur_detik"):
+            response.headers['Age'] = str(meta["umur_detik"])
+        return response
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Internal server error: {e}"}), 500
+
+
+# === ENDPOINT BATCH: /api/batch/<jenis> ===
+# Body: {"tickers": ["BBCA", "BBRI", ...]}. Respons dikompres (br/gzip) sesuai Accept-Encoding.
+# Mode streaming ({"stream": true}, ?stream=1, atau Accept: application/x-ndjson): tiap hasil
+# dikirim sebagai satu baris NDJSON begitu selesai (urutan selesai), diakhiri satu baris summary.
+# Batch dingin dibatasi budget yfinance bersama (default 2 req/detik): 500 ticker teknikal
+# tanpa cache butuh sekitar 250 detik. Hal ini hanya aman karena worker gunicorn berjenis gthread
+# (lihat Dockerfile); dengan worker sync, --timeout akan memutus stream di tengah jalan.
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', '8'))
+BATCH_MAX_TICKER = int(os.environ.get('BATCH_MAX_TICKER', '100'))
+BATCH_MAX_TICKER_STREAM = int(os.environ.get('BATCH_MAX_TICKER_STREAM', '500'))
+
+def _analisis_batch_satu(jenis, kode):
+    ticker_input = kode.upper()
+    try:
+        (log, data, success), meta = jalankan_analisis_swr(jenis, ticker_input + ".JK")
+    except Exception as e:
+        (log, data, success), meta = ([f"Internal server error: {e}"], None, False), None
+    hasil = {"status": "success" if success else "error", "ticker": ticker_input, "analysis_text": "\n".join(log)}
+    if success:
+        hasil[KUNCI_DATA[jenis]] = data
+        hasil["cache"] = meta
+    return hasil
+
+def _minta_stream(req_data):
+    return (req_data.get('stream') is True or request.args.get('stream') == '1'
+            or request.accept_mimetypes.best == 'application/x-ndjson')
+
+def _batch_stream(jenis, daftar_kode):
+    """Generator baris NDJSON: hasil per ticker sesuai urutan selesai, lalu summary."""
+    eksekutor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS)
+    try:
+        futures = {eksekutor.submit(_analisis_batch_satu, jenis, kode): i for i, kode in enumerate(daftar_kode)}
+        jumlah_sukses = 0
+        for future in as_completed(futures):
+            # Lepas future yang sudah dikirim agar hasilnya tidak tertahan sampai stream selesai
+            index = futures.pop(future)
+            hasil = future.result()
+            hasil["index"] = index
+            jumlah_sukses += hasil["status"] == "success"
+            yield hasil
+        yield {"status": "success", "jenis": jenis,
+               "summary": {"total": len(daftar_kode), "success": jumlah_sukses, "error": len(daftar_kode) - jumlah_sukses}}
+    finally:
+        # Klien putus di tengah jalan: ticker yang belum mulai tidak perlu dihitung
+        eksekutor.shutdown(wait=False, cancel_futures=True)
+
+@app.route('/api/batch/<jenis>', methods=['POST'])
+def handle_batch(jenis):
+    if jenis not in KUNCI_DATA:
+        return jsonify({"status": "error", "message": f"Jenis analisis '{jenis}' tidak dikenal"}), 404
+    try:
+        req_data = request.get_json()
+        if not req_data or not isinstance(req_data.get('tickers'), list) or not req_data['tickers']:
+            return jsonify({"status": "error", "message": "Mohon kirim {'tickers': ['KODE_SAHAM', ...]}"}), 400
+        daftar_kode = req_data['tickers']
+        # Validasi sebelum pekerjaan dimulai: di mode streaming header 200 sudah terkirim
+        if not all(isinstance(kode, str) and kode.strip() for kode in daftar_kode):
+            return jsonify({"status": "error", "message": "Setiap ticker harus berupa string kode saham yang tidak kosong"}), 400
+        daftar_kode = [kode.strip() for kode in daftar_kode]
+        if _minta_stream(req_data):
+            if len(daftar_kode) > BATCH_MAX_TICKER_STREAM:
+                return jsonify({"status": "error", "message": f"Maksimal {BATCH_MAX_TICKER_STREAM} ticker per batch streaming"}), 400
+            return respons_ndjson(_batch_stream(jenis, daftar_kode))
+        if len(daftar_kode) > BATCH_MAX_TICKER:
+            return jsonify({"status": "error", "message": f"Maksimal {BATCH_MAX_TICKER} ticker per batch"}), 400
+
+        with ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS) as eksekutor:
+            hasil = list(eksekutor.map(lambda kode: _analisis_batch_satu(jenis, kode), daftar_kode))
+
+        jumlah_sukses = sum(1 for h in hasil if h["status"] == "success")
+        return respons_json({
+            "status": "success",
+            "jenis": jenis,
+            "results": hasil,
+            "summary": {"total": len(hasil), "success": jumlah_sukses, "error": len(hasil) - jumlah_sukses}
+        }, boleh_kompres=True)
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Internal server error: {e}"}), 500
+
+
+# === ENDPOINT GRAFIK: /api/chart?ticker=BBCA&timeframe=1d ===
+@app.route('/api/chart', methods=['GET'])
+def handle_chart():
+    try:
+        ticker_input = request.args.get('ticker', '').upper()
+        if not ticker_input:
+            return jsonify({"status": "error", "message": "Mohon kirim ?ticker=KODE_SAHAM"}), 400
+        timeframe = request.args.get('timeframe', '1d')
+
+        png, pesan = get_chart_png(ticker_input + ".JK", timeframe)
+        if png is None:
+            return jsonify({"status": "error", "ticker": ticker_input, "message": pesan}), 404
+
+        response = app.response_class(png, mimetype='image/png')
+        response.headers['Cache-Control'] = "public, max-age=300"
+        return response
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Internal server error: {e}"}), 500
+
+
+# === ENDPOINT RANKING: relative strength & korelasi lintas universe ===
+# Body (opsional): {"tickers": ["BBCA", ...], "benchmark": "^JKSE"}. Default: LQ45 vs IHSG.
+@app.route('/api/ranking', methods=['POST'])
+def handle_ranking():
+    try:
+        req_data = request.get_json(silent=True) or {}
+        daftar_kode = req_data.get('tickers')
+        if daftar_kode is not None and (not isinstance(daftar_kode, list) or len(daftar_kode) > BATCH_MAX_TICKER):
+            return jsonify({"status": "error", "message": f"'tickers' harus berupa list (maksimal {BATCH_MAX_TICKER})"}), 400
+
+        log, data, success = get_ranking_analysis(daftar_kode, req_data.get('benchmark', '^JKSE'))
+        if not success:
+            return jsonify({"status": "error", "analysis_text": "\n".join(log)}), 404
+
+        return respons_json({
+            "status": "success",
+            "analysis_text": "\n".join(log),
+            "structured_data": data
+        }, boleh_kompres=True)
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Internal server error: {e}"}), 500
+
+
+# === ENDPOINT LANGGANAN WEBHOOK SINYAL ===
+# Body: {"ticker": "BBCA", "kondisi": "sinyal_berubah" | "pivot" | "fibonacci", "callback_url": "https://..."}
+# Semua endpoint langganan wajib membawa header X-Admin-Token (= WEBHOOK_ADMIN_TOKEN).
+def _tolak_non_admin():
+    if not langganan_sinyal.token_valid(request.headers.get('X-Admin-Token')):
+        return jsonify({"status": "error", "message": "Endpoint langganan membutuhkan X-Admin-Token yang valid"}), 403
+    return None
+
+@app.route('/api/langganan', methods=['POST'])
+def handle_tambah_langganan():
+    ditolak = _tolak_non_admin()
+    if ditolak:
+        return ditolak
+    try:
+        req_data = request.get_json()
+        if not req_data or not all(k in req_data for k in ('ticker', 'kondisi', 'callback_url')):
+            return jsonify({"status": "error", "message": "Mohon kirim {'ticker', 'kondisi', 'callback_url'}"}), 400
+        if req_data['kondisi'] not in KONDISI:
+            return jsonify({"status": "error", "message": f"Kondisi harus salah satu dari: {', '.join(KONDISI)}"}), 400
+        if not langganan_sinyal.callback_diizinkan(req_data['callback_url']):
+            return jsonify({"status": "error", "message": "callback_url harus berupa URL http/https ke host yang diizinkan"}), 400
+
+        langganan = tambah_langganan(req_data['ticker'], req_data['kondisi'], req_data['callback_url'])
+        return jsonify({"status": "success", "langganan": langganan}), 201
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Internal server error: {e}"}), 500
+
+@app.route('/api/langganan', methods=['GET'])
+def handle_daftar_langganan():
+    ditolak = _tolak_non_admin()
+    if ditolak:
+        return ditolak
+    return jsonify({"status": "success", "langganan": daftar_langganan()})
+
+@app.route('/api/langganan/<id_langganan>', methods=['DELETE'])
+def handle_hapus_langganan(id_langganan):
+    ditolak = _tolak_non_admin()
+    if ditolak:
+        return ditolak
+    if not hapus_langganan(id_langganan):
+        return jsonify({"status": "error", "message": f"Langganan '{id_langganan}' tidak ditemukan"}), 404
+    return jsonify({"status": "success"})
+
+
+# === ENDPOINT HISTORI HASIL ANALISIS ===
+# /api/histori?ticker=BBCA&jenis=teknikal&dari=2024-01-01&sampai=2024-06-30 (jenis, dari, sampai opsional)
+@app.route('/api/histori', methods=['GET'])
+def handle_histori():
+    try:
+        ticker_input = request.args.get('ticker', '').upper()
+        if not ticker_input:
+            return jsonify({"status": "error", "message": "Mohon kirim ?ticker=KODE_SAHAM"}), 400
+        jenis = request.args.get('jenis')
+        if jenis and jenis not in KUNCI_DATA:
+            return jsonify({"status": "error", "message": f"Jenis analisis '{jenis}' tidak dikenal"}), 404
+        dari, sampai = request.args.get('dari'), request.args.get('sampai')
+        for tanggal in (dari, sampai):
+            if tanggal and not (len(tanggal) == 10 and tanggal[4] == '-' and tanggal[7] == '-'):
+                return jsonify({"status": "error", "message": "Format tanggal harus YYYY-MM-DD"}), 400
+
+        histori = query_histori(ticker_input, jenis, dari, sampai)
+        return respons_json({"status": "success", "ticker": ticker_input, "jumlah": len(histori), "histori": histori},
+                            boleh_kompres=True)
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Internal server error: {e}"}), 500
+
+
+# === ENDPOINT METRIK ===
+@app.route('/api/metrics', methods=['GET'])
+def handle_metrics():
+    """
+    Status circuit breaker per upstream dan penghitung cache (termasuk jumlah penyajian data basi).
+    Breaker dan penghitung dicatat per proses: nilainya milik worker gunicorn yang menjawab
+    (lihat "worker"); hanya jumlah_entri cache yang berasal dari cache bersama semua worker.
+    """
+    return jsonify({"worker": {"pid": os.getpid(), "cakupan": "per_worker"},
+                    "breaker": status_breaker(), "cache": metrik_cache(), "penyimpanan": statistik_penyimpanan()})
+
+
 # Endpoint untuk mengetes apakah server jalan
 @app.route('/', methods=['GET'])
 def home():
-    return "Server Analisis Gabungan Aktif. Gunakan /api/fundamental atau /api/teknikal."
+    return "Server Analisis Gabungan Aktif. Gunakan /api/fundamental, /api/teknikal, atau /api/sentimen (POST), atau GET /api/<jenis>/<KODE>."
 
@@ -0,0 +1,70 @@
+"""
+Benchmark serialisasi payload analisis (tanpa akses jaringan).
+Membandingkan json standar (setara jsonify Flask) dengan lapisan serialisasi.py
+untuk respons tunggal dan batch 45 ticker (LQ45), beserta ukuran payload
+mentah / gzip / brotli.
+
+Jalankan: python bench_serialisasi.py
+"""
+import gzip
+import json
+import time
+
+import numpy as np
+
+import serialisasi
+
+JUMLAH_ULANG = 200
+JUMLAH_BATCH = 45
+
+
+def _payload_teknikal(rng):
+    kolom = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits',
+             'MACD_12_26_9', 'MACDh_12_26_9', 'MACDs_12_26_9', 'RSI_14',
+             'STOCHRSIk_14_14_3_3', 'STOCHRSId_14_14_3_3', 'MFI_14',
+             'P_auto15', 'R1_auto15', 'S1_auto15', 'R2_auto15', 'S2_auto15']
+    indikator = {k: np.float64(rng.normal(1000, 200)) for k in kolom}
+    indikator['Dividends'] = np.float64('nan')
+    indikator['tanggal_bar'] = '2026-10-16'
+    return {"status": "success", "ticker": "BBCA", "analysis_text": "x" * 2500, "last_indicators": indikator}
+
+
+def _payload_fundamental(rng):
+    emiten = {k: np.float64(rng.normal(10, 3)) for k in
+              ['harga', 'PER_yfinance', 'PBV_yfinance', 'ROE_yfinance', 'DER_final', 'ROE_final', 'PBV_final']}
+    emiten['net_income'] = np.int64(rng.integers(1e12, 5e13))
+    emiten['yield_final'] = np.float64('nan')
+    emiten['nama'] = 'Bank Central Asia Tbk.'
+    return {"status": "success", "ticker": "BBCA", "analysis_text": "y" * 4000,
+            "structured_data": {"emiten": emiten, "sektor": {"nama": "G. Financials", "PER": 14.67}}}
+
+
+def _json_standar(obj):
+    # Perilaku default jsonify: np.float64 lolos sebagai float, NaN ditulis apa adanya (JSON tidak valid)
+    return json.dumps(obj, default=lambda o: o.item() if isinstance(o, np.generic) else str(o)).encode('utf-8')
+
+
+def _ukur(nama, fungsi, payload):
+    mulai = time.perf_counter()
+    for _ in range(JUMLAH_ULANG):
+        body = fungsi(payload)
+    durasi_ms = (time.perf_counter() - mulai) / JUMLAH_ULANG * 1000
+    ukuran_gzip = len(gzip.compress(body, compresslevel=6))
+    ukuran_br = len(serialisasi.brotli.compress(body, quality=5)) if serialisasi.brotli else None
+    print(f"{nama:<40} {durasi_ms:8.3f} ms  raw={len(body):>8}  gzip={ukuran_gzip:>7}  br={ukuran_br}")
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    tunggal = _payload_teknikal(rng)
+    batch = {"status": "success", "jenis": "teknikal",
+             "results": [_payload_teknikal(rng) for _ in range(JUMLAH_BATCH)]}
+    batch_fundamental = {"status": "success", "jenis": "fundamental",
+                         "results": [_payload_fundamental(rng) for _ in range(JUMLAH_BATCH)]}
+
+    print(f"orjson: {'ya' if serialisasi.orjson else 'tidak'}, brotli: {'ya' if serialisasi.brotli else 'tidak'}")
+    for label, payload in [('teknikal tunggal', tunggal),
+                           (f'teknikal batch {JUMLAH_BATCH}', batch),
+                           (f'fundamental batch {JUMLAH_BATCH}', batch_fundamental)]:
+        _ukur(f"{label} / json standar", _json_standar, payload)
+        _ukur(f"{label} / serialisasi.dumps", serialisasi.dumps, payload)
@@ -0,0 +1,139 @@
+import bisect
+import math
+import time
+
+from cache_bersama import ambil_objek, ubah_objek
+
+# === Konfigurasi ===
+METRIK = ('PER', 'PBV', 'DER')
+MIN_EMITEN = 5          # Minimal jumlah emiten per sektor agar benchmark live dipakai
+PROPORSI_TRIM = 0.10    # Trimmed mean: buang 10% terbawah dan 10% teratas
+MAKS_UMUR_EMITEN = 7 * 24 * 60 * 60  # Rasio emiten yang tidak diperbarui selama ini tidak ikut dihitung
+INTERVAL_SEGARKAN = 24 * 60 * 60     # Rasio yang tidak berubah ditulis ulang paling cepat sekali sehari
+
+# Data disimpan di cache bersama (dipakai semua worker gunicorn), satu objek per sektor:
+#   ('sektor', sektor_idx) -> {'emiten': {ticker: (rasio, waktu_update)},
+#                              'terurut': {metrik: list nilai terurut}, 'agregat': hasil agregasi}
+#   'indeks'               -> {ticker: sektor_idx} (untuk mengeluarkan emiten yang pindah sektor)
+# Pembaruan satu emiten hanya menulis ulang objek sektornya; agregat sektor itu dihitung ulang
+# dari daftar terurut (bisect), dan ambil_benchmark cukup membaca agregat yang sudah jadi.
+NAMESPACE = 'benchmark'
+
+
+# === Fungsi Pembantu ===
+def _nilai_valid(metrik, nilai):
+    if nilai is None:
+        return False
+    try:
+        nilai = float(nilai)
+    except (TypeError, ValueError):
+        return False
+    if math.isnan(nilai) or math.isinf(nilai):
+        return False
+    # PER/PBV negatif (rugi / ekuitas negatif) akan merusak median sektor
+    if metrik in ('PER', 'PBV') and nilai <= 0:
+        return False
+    return nilai >= 0
+
+
+def _sektor_baru():
+    return {'emiten': {}, 'terurut': {m: [] for m in METRIK}, 'agregat': None}
+
+
+def _hapus_nilai(terurut, rasio):
+    for metrik, nilai in rasio.items():
+        daftar = terurut[metrik]
+        i = bisect.bisect_left(daftar, nilai)
+        if i < len(daftar) and daftar[i] == nilai:
+            daftar.pop(i)
+
+
+def _hitung_agregat(sektor):
+    hasil = {'jumlah_emiten': 0}
+    for metrik in METRIK:
+        daftar = sektor['terurut'][metrik]
+        n = len(daftar)
+        hasil['jumlah_emiten'] = max(hasil['jumlah_emiten'], n)
+        if n < MIN_EMITEN:
+            hasil[metrik] = None
+            hasil[metrik + '_trimmed_mean'] = None
+            continue
+        tengah = n // 2
+        hasil[metrik] = daftar[tengah] if n % 2 else (daftar[tengah - 1] + daftar[tengah]) / 2
+        k = int(n * PROPORSI_TRIM)
+        potongan = daftar[k:n - k]
+        hasil[metrik + '_trimmed_mean'] = sum(potongan) / len(potongan)
+    # Saat emiten tertua melewati MAKS_UMUR_EMITEN, agregat ini tidak berlaku lagi
+    waktu_tertua = min((waktu for _, waktu in sektor['emiten'].values()), default=None)
+    hasil['berlaku_sampai'] = None if waktu_tertua is None else waktu_tertua + MAKS_UMUR_EMITEN
+    return hasil
+
+
+def _ubah_sektor(sektor_idx, ticker_symbol, rasio_baru=None):
+    """
+    Mengeluarkan rasio lama emiten dari sektor, menyisipkan rasio_baru (jika ada),
+    membuang emiten kedaluwarsa, lalu menghitung ulang agregat sektor tersebut saja.
+    """
+    def _ubah(sektor):
+        batas = time.time() - MAKS_UMUR_EMITEN
+        for ticker, (rasio, waktu) in list(sektor['emiten'].items()):
+            if ticker == ticker_symbol or waktu < batas:
+                _hapus_nilai(sektor['terurut'], rasio)
+                del sektor['emiten'][ticker]
+        if rasio_baru is not None:
+            for metrik, nilai in rasio_baru.items():
+                bisect.insort(sektor['terurut'][metrik], nilai)
+            sektor['emiten'][ticker_symbol] = (rasio_baru, time.time())
+        sektor['agregat'] = _hitung_agregat(sektor)
+    return ubah_objek(NAMESPACE, ('sektor', sektor_idx), _ubah, default=_sektor_baru)
+
+
+# === FUNGSI UTAMA ===
+def perbarui_emiten(ticker_symbol, sektor_idx, rasio):
+    """
+    Memperbarui rasio satu emiten secara inkremental di cache bersama: nilai lama
+    dikeluarkan dari daftar terurut sektornya, nilai baru disisipkan (bisect), dan hanya
+    agregat sektor yang terdampak yang dihitung ulang. Emiten tanpa sektor IDX dikeluarkan.
+    """
+    rasio_valid = {m: float(rasio.get(m)) for m in METRIK if _nilai_valid(m, rasio.get(m))}
+
+    entri_indeks = ambil_objek(NAMESPACE, 'indeks')
+    sektor_lama = (entri_indeks[1] if entri_indeks is not None else {}).get(ticker_symbol)
+    if sektor_idx is not None and sektor_lama == sektor_idx:
+        # Rasio sama dan masih segar: tidak perlu menulis ulang objek sektor
+        entri = ambil_objek(NAMESPACE, ('sektor', sektor_idx))
+        lama = entri[1]['emiten'].get(ticker_symbol) if entri is not None else None
+        if lama is not None and lama[0] == rasio_valid and time.time() - lama[1] < INTERVAL_SEGARKAN:
+            return
+
+    if sektor_lama != sektor_idx:
+        def _ubah_indeks(indeks):
+            if sektor_idx is None:
+                indeks.pop(ticker_symbol, None)
+            else:
+                indeks[ticker_symbol] = sektor_idx
+        ubah_objek(NAMESPACE, 'indeks', _ubah_indeks, default=dict)
+        if sektor_lama is not None:
+            _ubah_sektor(sektor_lama, ticker_symbol)
+    if sektor_idx is not None:
+        _ubah_sektor(sektor_idx, ticker_symbol, rasio_valid)
+
+
+def ambil_benchmark(sektor_idx):
+    """
+    Mengambil benchmark live sektor: median PER/PBV/DER beserta trimmed mean-nya.
+    Metrik dengan emiten kurang dari MIN_EMITEN bernilai None (pakai tabel statis).
+    Mengembalikan None jika belum ada data sama sekali untuk sektor tersebut.
+    """
+    entri = ambil_objek(NAMESPACE, ('sektor', sektor_idx))
+    if entri is None:
+        return None
+    hasil = entri[1]['agregat']
+    if hasil is not None and hasil['berlaku_sampai'] is not None and hasil['berlaku_sampai'] <= time.time():
+        # Ada emiten kedaluwarsa walau sektor tidak ditulis sejak itu: keluarkan sekarang
+        hasil = _ubah_sektor(sektor_idx, None)['agregat']
+    if hasil is None or all(hasil[m] is None for m in METRIK):
+        return None
+    hasil = dict(hasil)
+    hasil.pop('berlaku_sampai')
+    return hasil
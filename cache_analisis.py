@@ -0,0 +1,245 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from analisis_fundamental import get_fundamental_analysis, get_fundamental_history
+from analisis_teknikal import get_technical_analysis
+from analisis_berita import get_sentiment_analysis
+from pembatas_upstream import breaker_terbuka
+from penyimpanan_hasil import simpan_async
+from cache_bersama import ambil_objek, simpan_objek, jumlah_entri, coba_kunci, lepas_kunci
+
+# === Pemetaan jenis analisis ke fungsi pipeline-nya ===
+FUNGSI_ANALISIS = {
+    'teknikal': get_technical_analysis,
+    'fundamental': get_fundamental_analysis,
+    'fundamental_histori': get_fundamental_history,
+    'sentimen': get_sentiment_analysis,
+}
+
+# === Masa berlaku default hasil analisis (detik) ===
+# Dipakai jika pemanggil (mis. penjadwal prefetch) tidak menentukan TTL sendiri.
+TTL_DEFAULT = {
+    'teknikal': 15 * 60,
+    'fundamental': 6 * 60 * 60,
+    'fundamental_histori': 6 * 60 * 60,
+    'sentimen': 15 * 60,
+}
+
+# Upstream yang dipakai tiap pipeline (untuk cek circuit breaker sebelum memanggil).
+# Sentimen memakai dua sumber; jika salah satu breaker terbuka hasilnya hanya parsial,
+# jadi data basi yang lengkap lebih baik disajikan.
+HOST_UPSTREAM = {
+    'teknikal': ('yfinance',),
+    'fundamental': ('yfinance',),
+    'fundamental_histori': ('yfinance',),
+    'sentimen': ('yfinance', 'news.google.com'),
+}
+
+# Stale-while-revalidate: hasil kedaluwarsa masih boleh disajikan (ditandai umurnya)
+# selama belum lebih tua dari batas ini, sambil diperbarui di background.
+MAKS_UMUR_BASI = int(os.environ.get('CACHE_MAKS_UMUR_BASI', str(3 * 24 * 60 * 60)))
+REFRESH_MAX_WORKERS = int(os.environ.get('CACHE_REFRESH_MAX_WORKERS', '4'))
+
+# Entri cache disimpan di cache bersama (satu salinan untuk semua worker gunicorn):
+# (jenis, ticker) -> (waktu_simpan, kedaluwarsa, hasil)
+# Refresh background per kunci dijaga flock di namespace 'refresh' agar hanya satu worker
+# yang memperbarui entri basi; _sedang_refresh mencegah percobaan ganda di proses yang sama.
+_lock = threading.Lock()
+_sedang_refresh = set()
+_eksekutor_refresh = ThreadPoolExecutor(max_workers=REFRESH_MAX_WORKERS, thread_name_prefix="refresh-cache")
+_metrik = {
+    'hit_segar': 0,
+    'hit_basi': 0,
+    'basi_breaker_terbuka': 0,
+    'ditolak_breaker': 0,
+    'miss': 0,
+    'refresh_sukses': 0,
+    'refresh_gagal': 0,
+    'refresh_di_worker_lain': 0,
+}
+
+
+def _catat(nama):
+    with _lock:
+        _metrik[nama] += 1
+
+
+def _entri(jenis, ticker_symbol):
+    entri = ambil_objek('analisis', (jenis, ticker_symbol))
+    return None if entri is None else entri[1]
+
+
+def ambil(jenis, ticker_symbol):
+    """
+    Mengambil hasil analisis (log, data, success) dari cache.
+    Mengembalikan None jika belum ada atau sudah kedaluwarsa.
+    """
+    entri = _entri(jenis, ticker_symbol)
+    if entri is None or entri[1] <= time.time():
+        return None
+    return entri[2]
+
+
+def simpan(jenis, ticker_symbol, hasil, ttl=None):
+    """Menyimpan hasil analisis yang sukses ke cache. Hasil gagal tidak disimpan."""
+    if not hasil[2]:
+        return
+    if ttl is None:
+        ttl = TTL_DEFAULT.get(jenis, 15 * 60)
+    sekarang = time.time()
+    simpan_objek('analisis', (jenis, ticker_symbol), (sekarang, sekarang + ttl, hasil))
+    # Hasil baru juga dicatat ke penyimpanan histori (antrean, di luar jalur request)
+    simpan_async(jenis, ticker_symbol, hasil[1])
+
+
+def sisa_ttl(jenis, ticker_symbol):
+    """Sisa masa berlaku entri cache dalam detik (0 jika tidak ada / kedaluwarsa)."""
+    entri = _entri(jenis, ticker_symbol)
+    if entri is None:
+        return 0
+    return max(0, int(entri[1] - time.time()))
+
+
+def _host_terbuka(jenis):
+    """Host upstream pipeline `jenis` yang breaker-nya sedang terbuka (None jika semua tertutup)."""
+    return next((host for host in HOST_UPSTREAM[jenis] if breaker_terbuka(host)), None)
+
+
+def _simpan_jika_lengkap(jenis, ticker_symbol, hasil, ttl=None):
+    """
+    Seperti simpan, tetapi entri lama tidak ditimpa jika breaker salah satu upstream terbuka
+    selama pipeline berjalan (hasil bisa parsial, mis. sentimen tanpa Google News).
+    """
+    if _host_terbuka(jenis) is not None and _entri(jenis, ticker_symbol) is not None:
+        return False
+    simpan(jenis, ticker_symbol, hasil, ttl=ttl)
+    return True
+
+
+def _jalankan_refresh(jenis, ticker_symbol, kunci_refresh):
+    try:
+        hasil = FUNGSI_ANALISIS[jenis](ticker_symbol)
+        tersimpan = _simpan_jika_lengkap(jenis, ticker_symbol, hasil)
+        _catat('refresh_sukses' if hasil[2] and tersimpan else 'refresh_gagal')
+    except Exception as e:
+        print(f"Refresh background {jenis} gagal untuk {ticker_symbol}: {e}")
+        _catat('refresh_gagal')
+    finally:
+        lepas_kunci(kunci_refresh)
+        with _lock:
+            _sedang_refresh.discard((jenis, ticker_symbol))
+
+
+def _refresh_background(jenis, ticker_symbol):
+    """
+    Menjadwalkan satu refresh background per kunci untuk semua worker: refresh ganda
+    di proses ini maupun yang sedang dijalankan worker lain diabaikan.
+    """
+    with _lock:
+        if (jenis, ticker_symbol) in _sedang_refresh:
+            return
+        _sedang_refresh.add((jenis, ticker_symbol))
+
+    kunci_refresh = coba_kunci('refresh', (jenis, ticker_symbol))
+    if kunci_refresh is not None:
+        entri = _entri(jenis, ticker_symbol)
+        if entri is not None and entri[1] > time.time():
+            # Worker lain baru saja selesai memperbarui entri ini
+            lepas_kunci(kunci_refresh)
+            kunci_refresh = None
+    if kunci_refresh is None:
+        _catat('refresh_di_worker_lain')
+        with _lock:
+            _sedang_refresh.discard((jenis, ticker_symbol))
+        return
+    _eksekutor_refresh.submit(_jalankan_refresh, jenis, ticker_symbol, kunci_refresh)
+
+
+def jalankan_analisis_swr(jenis, ticker_symbol):
+    """
+    Seperti jalankan_analisis, dengan aturan stale-while-revalidate dan circuit breaker:
+    - Hasil segar di cache: langsung dikembalikan.
+    - Hasil basi (belum lebih tua dari MAKS_UMUR_BASI): langsung dikembalikan, dan
+      satu refresh dijalankan di background (kecuali breaker upstream sedang terbuka).
+    - Tidak ada cache & breaker terbuka: gagal seketika tanpa menunggu upstream.
+    Mengembalikan ((list_of_strings, data, success_status), meta_cache).
+    """
+    sekarang = time.time()
+    entri = _entri(jenis, ticker_symbol)
+
+    if entri is not None and entri[1] > sekarang:
+        _catat('hit_segar')
+        return entri[2], {"sumber": "cache", "umur_detik": int(sekarang - entri[0]), "basi": False}
+
+    host = _host_terbuka(jenis)
+    if entri is not None and sekarang - entri[0] <= MAKS_UMUR_BASI:
+        meta = {"sumber": "cache", "umur_detik": int(sekarang - entri[0]), "basi": True}
+        if host is not None:
+            _catat('basi_breaker_terbuka')
+            meta["sedang_diperbarui"] = False
+        else:
+            _catat('hit_basi')
+            _refresh_background(jenis, ticker_symbol)
+            meta["sedang_diperbarui"] = True
+        return entri[2], meta
+
+    if host is not None:
+        _catat('ditolak_breaker')
+        pesan = f"❌ Upstream '{host}' sedang tidak tersedia dan belum ada data cache untuk {ticker_symbol}."
+        return ([pesan], None, False), {"sumber": "breaker_terbuka", "umur_detik": None, "basi": False}
+
+    _catat('miss')
+    hasil = FUNGSI_ANALISIS[jenis](ticker_symbol)
+    simpan(jenis, ticker_symbol, hasil)
+    return hasil, {"sumber": "baru", "umur_detik": 0, "basi": False}
+
+
+def jalankan_analisis(jenis, ticker_symbol, paksa=False, ttl=None):
+    """
+    Menjalankan pipeline analisis untuk satu ticker (format 'KODE.JK').
+    Jika paksa=False, mengikuti aturan jalankan_analisis_swr (cache segar / basi).
+    Jika paksa=True (mis. penjadwal prefetch), pipeline selalu dijalankan ulang.
+    Mengembalikan (list_of_strings, data, success_status) seperti fungsi aslinya.
+    """
+    if not paksa:
+        return jalankan_analisis_swr(jenis, ticker_symbol)[0]
+    hasil = FUNGSI_ANALISIS[jenis](ticker_symbol)
+    _simpan_jika_lengkap(jenis, ticker_symbol, hasil, ttl=ttl)
+    return hasil
+
+
+def metrik_cache():
+    """Snapshot penghitung cache (hit segar/basi, miss, refresh) untuk endpoint metrik."""
+    with _lock:
+        hasil = dict(_metrik)
+        hasil['sedang_refresh'] = len(_sedang_refresh)
+    hasil['jumlah_entri'] = jumlah_entri('analisis')
+    return hasil
+
+
+def versi_data(jenis, data):
+    """
+    Menentukan versi data dasar sebuah hasil analisis:
+    - teknikal   : tanggal bar terakhir + harga/volume bar tersebut (bar hari ini masih bergerak)
+    - fundamental: tanggal laporan kuartal terbaru + harga
+    - fundamental_histori: tanggal laporan terbaru + harga terakhir
+    - sentimen   : hash dari kumpulan berita (judul + link)
+    """
+    if jenis == 'teknikal':
+        return f"{data.get('tanggal_bar')}|{data.get('Close')}|{data.get('Volume')}"
+    if jenis == 'fundamental':
+        emiten = data.get('emiten', {})
+        return f"{emiten.get('tanggal_laporan')}|{emiten.get('harga')}"
+    if jenis == 'fundamental_histori':
+        return f"{data.get('tanggal_laporan')}|{data.get('harga')}"
+    berita = sorted((n.get('title') or '', n.get('link') or '') for n in data.get('news', []))
+    return hashlib.sha1(repr(berita).encode('utf-8')).hexdigest()
+
+
+def hitung_etag(jenis, ticker_symbol, data):
+    """ETag deterministik dari jenis analisis, ticker, dan versi data dasarnya."""
+    kunci = f"{jenis}:{ticker_symbol}:{versi_data(jenis, data)}"
+    return hashlib.sha1(kunci.encode('utf-8')).hexdigest()[:20]
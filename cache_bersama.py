@@ -0,0 +1,249 @@
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# === Konfigurasi ===
+# Cache lintas worker gunicorn: satu file per entri di tmpfs (/dev/shm) sehingga isinya
+# tinggal di RAM satu kali dan dipetakan (mmap) oleh semua worker, bukan disalin per proses.
+DIREKTORI_CACHE = os.environ.get(
+    'CACHE_BERSAMA_DIR',
+    '/dev/shm/n8n-cache' if os.path.isdir('/dev/shm') else os.path.join(tempfile.gettempdir(), 'n8n-cache'))
+MAKS_UMUR_FILE = int(os.environ.get('CACHE_BERSAMA_MAKS_UMUR', str(7 * 24 * 60 * 60)))
+INTERVAL_BERSIH = 500        # Bersihkan file lama setiap N penulisan (per proses)
+MAKS_PETA = 256              # Jumlah mmap frame yang dipertahankan per proses (tiap mmap memegang satu fd)
+
+# Format file frame: MAGIC | panjang header (<I) | header JSON | padding |
+# index int64 (ns, UTC) | nilai float64 (baris x kolom, column-major agar tiap kolom bersebelahan)
+MAGIC = b'N8NF'
+PERATAAN = 64
+
+_lock = threading.Lock()
+_peta = OrderedDict()  # path -> (st_ino, st_mtime_ns, header, index, matriks) - view mmap, bukan salinan
+_jumlah_tulis = 0
+
+
+# === Fungsi Pembantu ===
+def _path(namespace, kunci, ekstensi):
+    direktori = os.path.join(DIREKTORI_CACHE, namespace)
+    os.makedirs(direktori, mode=0o700, exist_ok=True)
+    nama = hashlib.sha1(repr(kunci).encode('utf-8')).hexdigest()[:32]
+    return os.path.join(direktori, nama + ekstensi)
+
+
+def _tulis_atomik(path, potongan):
+    """Menulis ke file sementara lalu os.replace: pembaca selalu melihat versi lama atau baru yang utuh."""
+    global _jumlah_tulis
+    sementara = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(sementara, 'wb') as f:
+            for bagian in potongan:
+                f.write(bagian)
+        os.replace(sementara, path)
+    except OSError as e:
+        # Mis. tmpfs penuh: cache bersama hanya optimasi, pemanggil tetap jalan tanpa cache
+        print(f"Cache bersama gagal menulis {path}: {e}")
+        try:
+            os.remove(sementara)
+        except OSError:
+            pass
+        return False
+
+    with _lock:
+        _jumlah_tulis += 1
+        perlu_bersih = _jumlah_tulis % INTERVAL_BERSIH == 0
+    if perlu_bersih:
+        bersihkan()
+    return True
+
+
+# === Frame Numerik (zero-copy lewat mmap) ===
+def simpan_frame(namespace, kunci, data):
+    """
+    Menerbitkan DataFrame numerik ber-index tanggal ke cache bersama.
+    Mengembalikan False jika frame tidak bisa disimpan (kolom non-numerik / index bukan tanggal).
+    """
+    if not isinstance(data.index, pd.DatetimeIndex):
+        return False
+    try:
+        matriks = np.asfortranarray(data.to_numpy(dtype='float64'))
+    except (TypeError, ValueError):
+        return False
+
+    tz = str(data.index.tz) if data.index.tz is not None else None
+    index_utc = data.index.tz_convert(None) if tz else data.index
+    index = np.asarray(index_utc, dtype='datetime64[ns]').view('<i8')
+
+    header = json.dumps({
+        "kolom": [str(k) for k in data.columns],
+        "dtype": [str(t) for t in data.dtypes],
+        "tz": tz,
+        "nama_index": data.index.name,
+        "baris": len(data),
+        "waktu": time.time(),
+    }).encode('utf-8')
+    offset = -(-(len(MAGIC) + 4 + len(header)) // PERATAAN) * PERATAAN
+    padding = b'\0' * (offset - len(MAGIC) - 4 - len(header))
+    return _tulis_atomik(_path(namespace, kunci, '.frame'),
+                         [MAGIC, struct.pack('<I', len(header)), header, padding,
+                          index.tobytes(), matriks.tobytes(order='F')])
+
+
+def _petakan(path):
+    """Memetakan file frame ke memori; hasil dipakai ulang selama file belum diganti (inode sama)."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    with _lock:
+        entri = _peta.get(path)
+        if entri is not None and entri[0] == st.st_ino and entri[1] == st.st_mtime_ns:
+            _peta.move_to_end(path)
+            return entri[2:]
+
+    try:
+        with open(path, 'rb') as f:
+            peta = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+    if peta[:len(MAGIC)] != MAGIC:
+        return None
+    panjang_header = struct.unpack_from('<I', peta, len(MAGIC))[0]
+    header = json.loads(peta[len(MAGIC) + 4:len(MAGIC) + 4 + panjang_header])
+    offset = -(-(len(MAGIC) + 4 + panjang_header) // PERATAAN) * PERATAAN
+    baris, kolom = header["baris"], len(header["kolom"])
+
+    # np.frombuffer tidak menyalin: array menunjuk langsung ke halaman yang dipetakan
+    index = np.frombuffer(peta, dtype='<i8', count=baris, offset=offset)
+    matriks = np.frombuffer(peta, dtype='<f8', count=baris * kolom,
+                            offset=offset + baris * 8).reshape((baris, kolom), order='F')
+
+    with _lock:
+        _peta[path] = (st.st_ino, st.st_mtime_ns, header, index, matriks)
+        while len(_peta) > MAKS_PETA:
+            _peta.popitem(last=False)
+    return header, index, matriks
+
+
+def ambil_frame(namespace, kunci, maks_umur, salin=True):
+    """
+    Mengambil DataFrame dari cache bersama jika umurnya < maks_umur detik; None jika tidak ada.
+    salin=False: DataFrame read-only (semua float64) yang menunjuk langsung ke mmap.
+    salin=True : salinan yang boleh diubah pemanggil, dengan dtype asli dikembalikan.
+    """
+    hasil = _petakan(_path(namespace, kunci, '.frame'))
+    if hasil is None:
+        return None
+    header, index, matriks = hasil
+    if time.time() - header["waktu"] >= maks_umur:
+        return None
+
+    index_waktu = pd.DatetimeIndex(index.view('datetime64[ns]'), name=header["nama_index"])
+    if header["tz"]:
+        index_waktu = index_waktu.tz_localize('UTC').tz_convert(header["tz"])
+    data = pd.DataFrame(matriks, index=index_waktu, columns=header["kolom"], copy=False)
+    if salin:
+        data = data.astype(dict(zip(header["kolom"], header["dtype"])))
+    return data
+
+
+# === Objek Umum (info ticker, laporan, hasil analisis, PNG grafik, ranking) ===
+def simpan_objek(namespace, kunci, objek):
+    """Menerbitkan objek (di-pickle) ke cache bersama."""
+    return _tulis_atomik(_path(namespace, kunci, '.pkl'),
+                         [pickle.dumps((time.time(), objek), protocol=pickle.HIGHEST_PROTOCOL)])
+
+
+def ambil_objek(namespace, kunci):
+    """Mengembalikan (waktu_simpan, objek) dari cache bersama, atau None jika tidak ada."""
+    try:
+        with open(_path(namespace, kunci, '.pkl'), 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Cache bersama {namespace} rusak untuk {kunci}: {e}")
+        return None
+
+
+def ubah_objek(namespace, kunci, fungsi_ubah, default=None):
+    """
+    Membaca-mengubah-menerbitkan objek secara atomik antar worker (flock + os.replace).
+    fungsi_ubah(objek) mengubah objek di tempat; objek baru dimulai dari `default()`.
+    Mengembalikan objek setelah diubah.
+    """
+    with open(_path(namespace, kunci, '.lock'), 'a') as kunci_file:
+        fcntl.flock(kunci_file, fcntl.LOCK_EX)
+        try:
+            entri = ambil_objek(namespace, kunci)
+            objek = entri[1] if entri is not None else default()
+            fungsi_ubah(objek)
+            simpan_objek(namespace, kunci, objek)
+            return objek
+        finally:
+            fcntl.flock(kunci_file, fcntl.LOCK_UN)
+
+
+def coba_kunci(namespace, kunci):
+    """
+    Mencoba mengambil kunci eksklusif lintas worker (flock non-blocking) untuk `kunci`.
+    Mengembalikan berkas yang harus diserahkan ke lepas_kunci, atau None jika kunci sedang
+    dipegang pihak lain. Kunci otomatis lepas jika proses pemegangnya mati.
+    """
+    berkas = open(_path(namespace, kunci, '.lock'), 'a')
+    try:
+        fcntl.flock(berkas, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        berkas.close()
+        return None
+    return berkas
+
+
+def lepas_kunci(berkas):
+    try:
+        fcntl.flock(berkas, fcntl.LOCK_UN)
+    finally:
+        berkas.close()
+
+
+def jumlah_entri(namespace):
+    try:
+        return sum(1 for nama in os.listdir(os.path.join(DIREKTORI_CACHE, namespace)) if not nama.endswith(('.tmp', '.lock')))
+    except FileNotFoundError:
+        return 0
+
+
+# === Pembersihan ===
+def bersihkan():
+    """Menghapus entri yang lebih tua dari MAKS_UMUR_FILE (dan file sementara yatim) dari tmpfs."""
+    batas = time.time() - MAKS_UMUR_FILE
+    try:
+        daftar_namespace = os.listdir(DIREKTORI_CACHE)
+    except FileNotFoundError:
+        return
+    for namespace in daftar_namespace:
+        direktori = os.path.join(DIREKTORI_CACHE, namespace)
+        try:
+            daftar_file = os.listdir(direktori)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        for nama in daftar_file:
+            if nama.endswith('.lock'):
+                continue  # file lock bisa sedang dipegang worker lain
+            path = os.path.join(direktori, nama)
+            try:
+                mtime = os.path.getmtime(path)
+                if mtime < batas or (nama.endswith('.tmp') and mtime < time.time() - 60):
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,125 @@
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from analisis_teknikal import ambil_histori, hitung_indikator
+from cache_bersama import ambil_objek, simpan_objek
+
+# === Konfigurasi ===
+# timeframe -> (period, interval) untuk yfinance
+TIMEFRAME = {
+    '1d': ('2y', '1d'),
+    '1wk': ('5y', '1wk'),
+    '1mo': ('10y', '1mo'),
+}
+JUMLAH_BAR = 120                 # Jumlah candle terakhir yang digambar
+MAX_PROSES = int(os.environ.get('GRAFIK_MAX_PROSES', '2'))
+TIMEOUT_RENDER = float(os.environ.get('GRAFIK_TIMEOUT', '30'))
+
+KOLOM_OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+KOLOM_MACD = ['MACD_12_26_9', 'MACDh_12_26_9', 'MACDs_12_26_9']
+KOLOM_GRAFIK = KOLOM_OHLCV + KOLOM_MACD + ['RSI_14', 'P_auto15', 'R1_auto15', 'S1_auto15', 'R2_auto15', 'S2_auto15']
+
+# PNG disimpan di cache bersama (dipakai semua worker), satu entri per (ticker, timeframe):
+# (ticker, timeframe) -> ((tanggal_bar, close), bytes PNG); versi lama langsung tertimpa
+_lock = threading.Lock()
+_eksekutor = None
+
+
+def _ambil_eksekutor():
+    # Dibuat malas di tiap worker; 'spawn' agar proses render tidak mewarisi thread/lock dari worker
+    global _eksekutor
+    with _lock:
+        if _eksekutor is None:
+            _eksekutor = ProcessPoolExecutor(max_workers=MAX_PROSES, mp_context=multiprocessing.get_context('spawn'))
+        return _eksekutor
+
+
+# === Render (berjalan di proses terpisah) ===
+def _ada_nilai(data, kolom):
+    return all(k in data.columns and data[k].notna().any() for k in kolom)
+
+
+def _render_png(data, fib_levels, judul):
+    """
+    Menggambar candlestick + pivot/Fibonacci (panel utama), volume, MACD, dan RSI ke PNG.
+    Panel MACD / RSI dilewati jika indikatornya tidak ada (histori terlalu pendek).
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import mplfinance as mpf
+
+    tambahan, rasio_panel = [], [4, 1]
+    if _ada_nilai(data, KOLOM_MACD):
+        panel = len(rasio_panel)
+        tambahan += [
+            mpf.make_addplot(data['MACD_12_26_9'], panel=panel, color='tab:blue', ylabel='MACD'),
+            mpf.make_addplot(data['MACDs_12_26_9'], panel=panel, color='tab:orange'),
+            mpf.make_addplot(data['MACDh_12_26_9'], panel=panel, type='bar', color='gray', alpha=0.5),
+        ]
+        rasio_panel.append(2)
+    if _ada_nilai(data, ['RSI_14']):
+        panel = len(rasio_panel)
+        tambahan += [
+            mpf.make_addplot(data['RSI_14'], panel=panel, color='tab:purple', ylabel='RSI', ylim=(0, 100)),
+            mpf.make_addplot([70] * len(data), panel=panel, color='red', linestyle='--', width=0.7),
+            mpf.make_addplot([30] * len(data), panel=panel, color='green', linestyle='--', width=0.7),
+        ]
+        rasio_panel.append(2)
+
+    # Garis horizontal: pivot bar terakhir (merah/hitam/hijau) dan level Fibonacci (emas)
+    terakhir = data.iloc[-1]
+    level, warna = [], []
+    for kolom, w in [('R2_auto15', 'darkred'), ('R1_auto15', 'red'), ('P_auto15', 'black'),
+                     ('S1_auto15', 'green'), ('S2_auto15', 'darkgreen')]:
+        nilai = terakhir.get(kolom)
+        if nilai is not None and nilai == nilai:  # ada dan bukan NaN
+            level.append(float(nilai)); warna.append(w)
+    for nilai in fib_levels.values():
+        level.append(float(nilai)); warna.append('goldenrod')
+
+    opsi = dict(type='candle', style='yahoo', volume=True, title=judul,
+                panel_ratios=tuple(rasio_panel), figsize=(12, 9), tight_layout=True)
+    if tambahan:
+        opsi['addplot'] = tambahan
+    if level:
+        opsi['hlines'] = dict(hlines=level, colors=warna, linestyle='--', linewidths=0.7)
+
+    buffer = io.BytesIO()
+    mpf.plot(data, savefig=dict(fname=buffer, format='png', dpi=100), **opsi)
+    return buffer.getvalue()
+
+
+# === FUNGSI UTAMA GRAFIK ===
+def get_chart_png(ticker_symbol_with_jk, timeframe='1d'):
+    """
+    Menghasilkan PNG candlestick untuk ticker & timeframe.
+    PNG di-cache bersama per (ticker, timeframe) dan berlaku selama tanggal & close bar
+    terakhir sama, agar grafik intraday tidak tertahan versi lama.
+    Mengembalikan (png_bytes atau None, pesan_error).
+    """
+    if timeframe not in TIMEFRAME:
+        return None, f"Timeframe '{timeframe}' tidak didukung. Pilihan: {', '.join(TIMEFRAME)}"
+    period, interval = TIMEFRAME[timeframe]
+
+    data = ambil_histori(ticker_symbol_with_jk, period=period, interval=interval)
+    if data.empty:
+        return None, "Gagal mengambil data."
+
+    kunci = (ticker_symbol_with_jk, timeframe)
+    versi = (data.index[-1].strftime('%Y-%m-%d'), float(data['Close'].iloc[-1]))
+    entri = ambil_objek('grafik', kunci)
+    if entri is not None and entri[1][0] == versi:
+        return entri[1][1], None
+
+    fib_levels, swing_high, swing_low = hitung_indikator(data)
+    # pandas_ta tidak membuat kolom MACD/RSI jika histori terlalu pendek (mis. emiten baru IPO)
+    potongan = data[[k for k in KOLOM_GRAFIK if k in data.columns]].tail(JUMLAH_BAR)
+    judul = f"{ticker_symbol_with_jk.replace('.JK', '')} ({timeframe})"
+
+    png = _ambil_eksekutor().submit(_render_png, potongan, fib_levels, judul).result(timeout=TIMEOUT_RENDER)
+
+    simpan_objek('grafik', kunci, (versi, png))
+    return png, None
@@ -0,0 +1,277 @@
+import fcntl
+import hashlib
+import hmac
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from urllib.parse import urlparse
+
+import cache_analisis
+import pengiriman_webhook
+from analisis_teknikal import ambil_histori, get_technical_analysis
+from serialisasi import dumps
+
+# === Konfigurasi ===
+# Langganan disimpan di file bersama agar bisa didaftarkan lewat worker gunicorn mana pun;
+# evaluasi hanya dijalankan oleh satu worker (pemegang evaluator.lock).
+DIREKTORI_WEBHOOK = os.environ.get('WEBHOOK_DIR', '/tmp/n8n-webhook')
+INTERVAL_EVALUASI = int(os.environ.get('WEBHOOK_INTERVAL', '300'))
+
+# Server akan mem-POST ke callback_url, jadi pengelolaan langganan hanya untuk admin:
+# WEBHOOK_ADMIN_TOKEN wajib diisi (dikirim di header X-Admin-Token). Jika WEBHOOK_HOST_DIIZINKAN
+# diisi (host dipisah koma), callback_url hanya boleh mengarah ke host tersebut.
+TOKEN_ADMIN = os.environ.get('WEBHOOK_ADMIN_TOKEN', '')
+HOST_DIIZINKAN = {h.strip().lower() for h in os.environ.get('WEBHOOK_HOST_DIIZINKAN', '').split(',') if h.strip()}
+
+KONDISI = ('sinyal_berubah', 'pivot', 'fibonacci')
+
+_thread = None
+_stop = threading.Event()
+_fd_evaluator = None
+_versi_terakhir = {}             # kode -> (tanggal_bar, close) yang terakhir dievaluasi
+
+
+# === Otorisasi ===
+def token_valid(token):
+    return bool(TOKEN_ADMIN) and hmac.compare_digest(token or '', TOKEN_ADMIN)
+
+
+def callback_diizinkan(callback_url):
+    """callback_url harus http/https dan (jika allowlist diisi) host-nya ada di WEBHOOK_HOST_DIIZINKAN."""
+    url = urlparse(str(callback_url))
+    if url.scheme not in ('http', 'https') or not url.hostname:
+        return False
+    return not HOST_DIIZINKAN or url.hostname.lower() in HOST_DIIZINKAN
+
+
+# === Penyimpanan Langganan (file JSON + flock) ===
+def _path(nama):
+    os.makedirs(DIREKTORI_WEBHOOK, exist_ok=True)
+    return os.path.join(DIREKTORI_WEBHOOK, nama)
+
+
+def _ubah_langganan(fungsi_ubah):
+    """Membaca-mengubah-menulis daftar langganan secara atomik (flock + os.replace)."""
+    with open(_path('langganan.lock'), 'a') as kunci:
+        fcntl.flock(kunci, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(_path('langganan.json')) as f:
+                    langganan = json.load(f)
+            except (FileNotFoundError, ValueError):
+                langganan = {}
+            hasil, berubah = fungsi_ubah(langganan)
+            if berubah:
+                sementara = _path(f'langganan.json.{os.getpid()}.tmp')
+                with open(sementara, 'w') as f:
+                    json.dump(langganan, f)
+                os.replace(sementara, _path('langganan.json'))
+            return hasil
+        finally:
+            fcntl.flock(kunci, fcntl.LOCK_UN)
+
+
+def tambah_langganan(kode, kondisi, callback_url):
+    """Mendaftarkan (ticker, kondisi, callback URL). Mengembalikan dict langganan baru."""
+    langganan_baru = {
+        "id": uuid.uuid4().hex[:12],
+        "ticker": kode.upper(),
+        "kondisi": kondisi,
+        "callback_url": callback_url,
+        "dibuat": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "state": None,
+        "urutan": 0,  # jumlah transisi yang sudah terkirim (bagian dari event_id)
+    }
+
+    def _tambah(langganan):
+        langganan[langganan_baru["id"]] = langganan_baru
+        return langganan_baru, True
+    return _ubah_langganan(_tambah)
+
+
+def daftar_langganan():
+    return _ubah_langganan(lambda langganan: (list(langganan.values()), False))
+
+
+def hapus_langganan(id_langganan):
+    def _hapus(langganan):
+        ada = langganan.pop(id_langganan, None) is not None
+        return ada, ada
+    return _ubah_langganan(_hapus)
+
+
+# === Penentuan State Kondisi ===
+def hitung_state(kondisi, indikator):
+    """
+    Mengubah indikator terakhir menjadi state diskret; webhook dikirim saat state berubah.
+    - sinyal_berubah: BULLISH / BEARISH / NETRAL
+    - pivot         : zona harga terhadap R2/R1/P/S1/S2
+    - fibonacci     : level Fibonacci tertinggi yang sudah ditembus harga
+    """
+    if kondisi == 'sinyal_berubah':
+        return indikator.get('sinyal')
+
+    harga = indikator.get('harga_terakhir')
+    if harga is None:
+        return None
+
+    if kondisi == 'pivot':
+        level = [indikator.get(k) for k in ('R2_auto15', 'R1_auto15', 'P_auto15', 'S1_auto15', 'S2_auto15')]
+        if any(v is None or v != v for v in level):
+            return None
+        r2, r1, p, s1, s2 = level
+        if harga > r2: return "DI_ATAS_R2"
+        if harga > r1: return "DI_ATAS_R1"
+        if harga > p: return "DI_ATAS_PIVOT"
+        if harga >= s1: return "DI_BAWAH_PIVOT"
+        if harga >= s2: return "DI_BAWAH_S1"
+        return "DI_BAWAH_S2"
+
+    if kondisi == 'fibonacci':
+        fib_levels = indikator.get('fibonacci') or {}
+        if not fib_levels:
+            return None
+        for nama, nilai in sorted(fib_levels.items(), key=lambda item: item[1], reverse=True):
+            if harga >= nilai:
+                return f"DI_ATAS_FIB_{nama}"
+        return "DI_BAWAH_SWING_LOW"
+    return None
+
+
+# === Pengiriman Webhook ===
+def _catat_hasil_kirim(kode, id_langganan, state_lama, state_baru, berhasil):
+    """
+    State langganan baru disimpan setelah webhook diterima (compare-and-set terhadap state lama).
+    Jika pengiriman gagal, ticker dievaluasi ulang di putaran berikutnya sehingga transisi dikirim lagi.
+    """
+    def _simpan(langganan):
+        l = langganan.get(id_langganan)
+        if l is None or l.get('state') != state_lama:
+            return False, False
+        l['state'] = state_baru
+        l['urutan'] = l.get('urutan', 0) + 1
+        return True, True
+
+    if not berhasil or not _ubah_langganan(_simpan):
+        _versi_terakhir.pop(kode, None)
+
+
+def _kirim_webhook(langganan, state_baru, indikator):
+    state_lama = langganan['state']
+    # urutan + state lama membedakan transisi A->B->A->B dalam satu tanggal bar
+    event_id = hashlib.sha1(
+        f"{langganan['id']}|{langganan.get('urutan', 0)}|{state_lama}|{state_baru}|{indikator.get('tanggal_bar')}".encode('utf-8')
+    ).hexdigest()[:20]
+
+    body = dumps({
+        "event_id": event_id,
+        "langganan_id": langganan['id'],
+        "ticker": langganan['ticker'],
+        "kondisi": langganan['kondisi'],
+        "state_lama": state_lama,
+        "state_baru": state_baru,
+        "harga": indikator.get('harga_terakhir'),
+        "sinyal": indikator.get('sinyal'),
+        "tanggal_bar": indikator.get('tanggal_bar'),
+        "waktu": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    return pengiriman_webhook.kirim(
+        langganan['callback_url'], body, event_id,
+        saat_selesai=lambda berhasil: _catat_hasil_kirim(langganan['ticker'], langganan['id'], state_lama, state_baru, berhasil))
+
+
+# === Evaluator ===
+def evaluasi_sekali():
+    """
+    Satu putaran evaluasi: ticker dihitung ulang jika bar terakhirnya berubah atau ada
+    langganan yang belum punya state awal; webhook dikirim untuk langganan yang state-nya
+    bertransisi. Mengembalikan daftar Future pengiriman (untuk pengujian).
+    """
+    per_ticker = {}
+    for langganan in daftar_langganan():
+        per_ticker.setdefault(langganan['ticker'], []).append(langganan)
+
+    state_awal = {}
+    pengiriman = []
+    for kode, daftar in per_ticker.items():
+        ticker_symbol = kode + ".JK"
+        try:
+            data = ambil_histori(ticker_symbol, period="2y", interval="1d", maks_umur=0)
+        except Exception as e:
+            print(f"Evaluator webhook gagal mengambil {ticker_symbol}: {e}")
+            continue
+        if data.empty:
+            continue
+        versi = (data.index[-1].strftime('%Y-%m-%d'), float(data['Close'].iloc[-1]))
+        ada_baru = any(langganan.get('state') is None for langganan in daftar)
+        if _versi_terakhir.get(kode) == versi and not ada_baru:
+            continue
+
+        hasil = get_technical_analysis(ticker_symbol, data=data)
+        if not hasil[2]:
+            continue
+        _versi_terakhir[kode] = versi
+        cache_analisis.simpan('teknikal', ticker_symbol, hasil)
+
+        indikator = hasil[1]
+        for langganan in daftar:
+            state_baru = hitung_state(langganan['kondisi'], indikator)
+            if state_baru is None or state_baru == langganan.get('state'):
+                continue
+            if langganan.get('state') is None:
+                # Evaluasi pertama hanya mencatat state awal, tanpa mengirim webhook
+                state_awal[langganan['id']] = state_baru
+            else:
+                future = _kirim_webhook(langganan, state_baru, indikator)
+                if future is not None:
+                    pengiriman.append(future)
+
+    if state_awal:
+        def _simpan_state_awal(langganan):
+            for id_langganan, state in state_awal.items():
+                if id_langganan in langganan and langganan[id_langganan].get('state') is None:
+                    langganan[id_langganan]['state'] = state
+            return None, True
+        _ubah_langganan(_simpan_state_awal)
+    return pengiriman
+
+
+def _coba_jadi_evaluator():
+    """Hanya satu proses yang memegang evaluator.lock; worker lain mencoba lagi di putaran berikutnya."""
+    global _fd_evaluator
+    if _fd_evaluator is not None:
+        return True
+    fd = os.open(_path('evaluator.lock'), os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+    _fd_evaluator = fd
+    return True
+
+
+def _loop_evaluator():
+    while not _stop.is_set():
+        try:
+            if _coba_jadi_evaluator():
+                evaluasi_sekali()
+        except Exception as e:
+            print(f"Evaluator webhook error: {e}")
+        _stop.wait(INTERVAL_EVALUASI)
+
+
+def mulai_evaluator():
+    """Menyalakan evaluator webhook di background thread (daemon)."""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop_evaluator, name="evaluator-webhook", daemon=True)
+    _thread.start()
+
+
+def hentikan_evaluator():
+    _stop.set()
@@ -0,0 +1,306 @@
+import fcntl
+import os
+import random
+import struct
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+try:
+    # yfinance >= 0.2.5x memakai curl_cffi; exception-nya bukan turunan requests.exceptions
+    from curl_cffi.requests import exceptions as curl_exceptions
+except ImportError:
+    curl_exceptions = None
+
+# === Budget per host upstream: (token per detik, kapasitas burst) ===
+# Bisa ditimpa lewat environment, mis. UPSTREAM_BUDGET_YFINANCE="2,5"
+BUDGET_HOST = {
+    'yfinance': (2.0, 5),
+    'news.google.com': (1.0, 3),
+}
+BUDGET_DEFAULT = (1.0, 2)
+
+# Lokasi file state bersama agar semua worker gunicorn berbagi budget yang sama
+DIREKTORI_STATE = os.environ.get('UPSTREAM_STATE_DIR', '/tmp/n8n-upstream')
+
+MAX_PERCOBAAN = int(os.environ.get('UPSTREAM_MAX_PERCOBAAN', '4'))
+MAX_PERCOBAAN_KOSONG = 2       # Respons kosong (mis. DataFrame kosong) hanya diulang sekali
+BACKOFF_DASAR = 0.5            # Detik
+BACKOFF_MAKS = 8.0             # Detik
+MAX_TUNGGU_TOKEN = float(os.environ.get('UPSTREAM_MAX_TUNGGU', '20'))
+
+# Penyesuaian adaptif laju (AIMD): dipotong setengah saat kena 429, pulih perlahan saat sukses
+FAKTOR_MIN = 0.1
+FAKTOR_TURUN = 0.5
+FAKTOR_NAIK = 0.05
+
+_FORMAT_STATE = '<ddd'  # tokens, waktu_refill_terakhir, faktor_laju
+_UKURAN_STATE = struct.calcsize(_FORMAT_STATE)
+
+# Circuit breaker per host (per proses): terbuka setelah AMBANG_GAGAL_BREAKER kegagalan
+# beruntun, lalu setelah DURASI_BUKA_BREAKER detik satu panggilan percobaan diizinkan.
+AMBANG_GAGAL_BREAKER = int(os.environ.get('UPSTREAM_AMBANG_BREAKER', '5'))
+DURASI_BUKA_BREAKER = float(os.environ.get('UPSTREAM_DURASI_BREAKER', '30'))
+
+_lock_global = threading.Lock()
+_fd_host = {}
+_lock_host = {}
+_lock_breaker = threading.Lock()
+_breaker = {}  # host -> dict status breaker
+
+
+class BatasUpstreamTerlampaui(Exception):
+    """Dilempar jika token untuk host upstream tidak tersedia dalam MAX_TUNGGU_TOKEN detik."""
+
+
+class UpstreamTidakTersedia(Exception):
+    """Dilempar tanpa memanggil upstream karena circuit breaker host sedang terbuka."""
+
+
+class UpstreamRateLimited(Exception):
+    """Upstream menjawab 429 / Too Many Requests."""
+
+    def __init__(self, pesan, retry_after=None):
+        super().__init__(pesan)
+        self.retry_after = retry_after
+
+
+# === Fungsi Pembantu ===
+def _budget(host):
+    env = os.environ.get('UPSTREAM_BUDGET_' + host.upper().replace('.', '_').replace('-', '_'))
+    if env:
+        laju, burst = env.split(',')
+        return float(laju), float(burst)
+    return BUDGET_HOST.get(host, BUDGET_DEFAULT)
+
+
+def _buka_state(host):
+    with _lock_global:
+        if host not in _fd_host:
+            os.makedirs(DIREKTORI_STATE, exist_ok=True)
+            path = os.path.join(DIREKTORI_STATE, host.replace('/', '_') + '.bucket')
+            _fd_host[host] = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+            _lock_host[host] = threading.Lock()
+        return _fd_host[host], _lock_host[host]
+
+
+def _ubah_state(host, fungsi_ubah):
+    """
+    Membaca-mengubah-menulis state bucket host di bawah kunci thread + flock file,
+    sehingga aman dipakai bersamaan oleh banyak thread dan banyak proses worker.
+    """
+    laju, burst = _budget(host)
+    fd, lock = _buka_state(host)
+    with lock:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            mentah = os.pread(fd, _UKURAN_STATE, 0)
+            sekarang = time.time()
+            if len(mentah) == _UKURAN_STATE:
+                tokens, terakhir, faktor = struct.unpack(_FORMAT_STATE, mentah)
+            else:
+                tokens, terakhir, faktor = float(burst), sekarang, 1.0
+            tokens = min(float(burst), tokens + max(0.0, sekarang - terakhir) * laju * faktor)
+            tokens, faktor, hasil = fungsi_ubah(tokens, faktor, laju)
+            os.pwrite(fd, struct.pack(_FORMAT_STATE, tokens, sekarang, faktor), 0)
+            return hasil
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def ambil_token(host):
+    """Menunggu sampai ada token untuk host (token bucket bersama antar worker)."""
+    batas = time.monotonic() + MAX_TUNGGU_TOKEN
+
+    def _ambil(tokens, faktor, laju):
+        if tokens >= 1:
+            return tokens - 1, faktor, 0.0
+        return tokens, faktor, (1 - tokens) / (laju * faktor)
+
+    while True:
+        tunggu = _ubah_state(host, _ambil)
+        if tunggu <= 0:
+            return
+        if time.monotonic() + tunggu > batas:
+            raise BatasUpstreamTerlampaui(f"Budget upstream '{host}' habis, coba lagi nanti.")
+        time.sleep(tunggu)
+
+
+def catat_rate_limited(host):
+    """Memperlambat laju host (dibagi dua) dan mengosongkan token setelah menerima 429."""
+    _ubah_state(host, lambda tokens, faktor, laju: (0.0, max(FAKTOR_MIN, faktor * FAKTOR_TURUN), None))
+
+
+def catat_sukses(host):
+    """Memulihkan laju host sedikit demi sedikit setelah panggilan sukses."""
+    def _pulih(tokens, faktor, laju):
+        return tokens, min(1.0, faktor + FAKTOR_NAIK), None
+    _ubah_state(host, _pulih)
+
+
+def _adalah_rate_limit(e):
+    if isinstance(e, UpstreamRateLimited):
+        return True
+    # yfinance >= 0.2.5x melempar YFRateLimitError; versi lama hanya menyertakan pesan 429
+    pesan = str(e)
+    return type(e).__name__ == 'YFRateLimitError' or '429' in pesan or 'Too Many Requests' in pesan
+
+
+# Error jaringan sementara yang layak diulang, baik dari requests (Google News) maupun curl_cffi (yfinance)
+_ERROR_SEMENTARA = (requests.exceptions.ConnectionError, requests.exceptions.Timeout) + (
+    (curl_exceptions.ConnectionError, curl_exceptions.Timeout) if curl_exceptions is not None else ())
+
+
+def _perlu_retry(e):
+    return _adalah_rate_limit(e) or isinstance(e, _ERROR_SEMENTARA)
+
+
+# Error HTTP/jaringan dari klien mana pun dihitung sebagai kegagalan upstream oleh breaker
+_ERROR_UPSTREAM = (requests.exceptions.RequestException,) + (
+    (curl_exceptions.RequestException,) if curl_exceptions is not None else ())
+
+
+def _gagal_upstream(e):
+    return _perlu_retry(e) or isinstance(e, _ERROR_UPSTREAM)
+
+
+def _jeda_backoff(percobaan, retry_after=None):
+    if retry_after is not None:
+        return min(float(retry_after), BACKOFF_MAKS)
+    # Full jitter: acak antara 0 dan batas eksponensial
+    return random.uniform(0, min(BACKOFF_MAKS, BACKOFF_DASAR * (2 ** percobaan)))
+
+
+# === CIRCUIT BREAKER ===
+def _state_breaker(host):
+    return _breaker.setdefault(host, {'status': 'tertutup', 'gagal_beruntun': 0, 'dibuka_pada': 0.0,
+                                      'percobaan_berjalan': False, 'short_circuit': 0, 'jumlah_dibuka': 0})
+
+
+def breaker_terbuka(host):
+    """True jika panggilan ke host saat ini akan langsung ditolak oleh breaker."""
+    with _lock_breaker:
+        state = _state_breaker(host)
+        if state['status'] == 'tertutup':
+            return False
+        if state['status'] == 'terbuka' and time.time() - state['dibuka_pada'] >= DURASI_BUKA_BREAKER:
+            return False
+        return state['status'] == 'terbuka' or state['percobaan_berjalan']
+
+
+def _izinkan_panggilan(host):
+    with _lock_breaker:
+        state = _state_breaker(host)
+        if state['status'] == 'terbuka' and time.time() - state['dibuka_pada'] >= DURASI_BUKA_BREAKER:
+            state['status'] = 'setengah_terbuka'
+        if state['status'] == 'setengah_terbuka' and not state['percobaan_berjalan']:
+            state['percobaan_berjalan'] = True
+            return
+        if state['status'] != 'tertutup':
+            state['short_circuit'] += 1
+            raise UpstreamTidakTersedia(f"Upstream '{host}' sedang tidak tersedia (circuit breaker terbuka).")
+
+
+def _catat_hasil_breaker(host, sukses):
+    """sukses=True/False mencatat hasil; None berarti netral (error bukan dari upstream)."""
+    with _lock_breaker:
+        state = _state_breaker(host)
+        state['percobaan_berjalan'] = False
+        if sukses is None:
+            return
+        if sukses:
+            state['status'] = 'tertutup'
+            state['gagal_beruntun'] = 0
+            return
+        state['gagal_beruntun'] += 1
+        if state['status'] == 'setengah_terbuka' or state['gagal_beruntun'] >= AMBANG_GAGAL_BREAKER:
+            if state['status'] != 'terbuka':
+                state['jumlah_dibuka'] += 1
+            state['status'] = 'terbuka'
+            state['dibuka_pada'] = time.time()
+
+
+def status_breaker():
+    """Snapshot status breaker semua host (untuk endpoint metrik)."""
+    with _lock_breaker:
+        return {host: {k: v for k, v in state.items() if k != 'percobaan_berjalan'}
+                for host, state in _breaker.items()}
+
+
+# === FUNGSI UTAMA ===
+def panggil_upstream(host, fungsi, kosong=None):
+    """
+    Menjalankan `fungsi()` (pemanggilan ke upstream `host`) dengan circuit breaker,
+    rate limit bersama, dan retry adaptif ber-jitter.
+    - Breaker terbuka: langsung melempar UpstreamTidakTersedia tanpa menunggu upstream.
+    - Error 429 / koneksi: diulang sampai MAX_PERCOBAAN kali, laju host diturunkan saat 429.
+    - `kosong(hasil)` bernilai True: dianggap respons kosong, diulang maksimal MAX_PERCOBAAN_KOSONG kali.
+      Jika masih kosong, hasil tetap dikembalikan tetapi dicatat breaker sebagai kegagalan
+      (yfinance menyembunyikan error jaringan di balik frame kosong).
+    Error lain (mis. AttributeError) langsung diteruskan ke pemanggil.
+    """
+    _izinkan_panggilan(host)
+    try:
+        hasil, masih_kosong = _panggil_dengan_retry(host, fungsi, kosong)
+    except Exception as e:
+        _catat_hasil_breaker(host, False if _gagal_upstream(e) else None)
+        raise
+    _catat_hasil_breaker(host, not masih_kosong)
+    return hasil
+
+
+def _panggil_dengan_retry(host, fungsi, kosong):
+    """Mengembalikan (hasil, masih_kosong)."""
+    hasil = None
+    percobaan_kosong = 0
+    for percobaan in range(MAX_PERCOBAAN):
+        ambil_token(host)
+        try:
+            hasil = fungsi()
+        except Exception as e:
+            if not _perlu_retry(e) or percobaan == MAX_PERCOBAAN - 1:
+                raise
+            retry_after = getattr(e, 'retry_after', None)
+            if _adalah_rate_limit(e):
+                catat_rate_limited(host)
+            time.sleep(_jeda_backoff(percobaan, retry_after))
+            continue
+
+        if kosong is not None and kosong(hasil):
+            percobaan_kosong += 1
+            if percobaan_kosong >= MAX_PERCOBAAN_KOSONG or percobaan == MAX_PERCOBAAN - 1:
+                return hasil, True
+            time.sleep(_jeda_backoff(percobaan))
+            continue
+
+        catat_sukses(host)
+        return hasil, False
+    return hasil, kosong is not None
+
+
+def http_get(url, **kwargs):
+    """Pengganti requests.get yang melewati rate limiter dan retry untuk host URL tersebut."""
+    host = urlparse(url).hostname or 'default'
+
+    def _get():
+        r = requests.get(url, **kwargs)
+        if r.status_code == 429 or r.status_code >= 500:
+            retry_after = r.headers.get('Retry-After')
+            if r.status_code == 429:
+                raise UpstreamRateLimited(f"429 Too Many Requests dari {host}",
+                                          retry_after=retry_after if retry_after and retry_after.isdigit() else None)
+            raise requests.exceptions.ConnectionError(f"{r.status_code} dari {host}")
+        return r
+
+    return panggil_upstream(host, _get)
+
+
+def panggil_yfinance(fungsi, kosong=None):
+    """Pintasan untuk semua pemanggilan yfinance (history, info, laporan keuangan, berita)."""
+    return panggil_upstream('yfinance', fungsi, kosong=kosong)
+
+
+def frame_kosong(df):
+    return df is None or df.empty
@@ -0,0 +1,66 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# === Konfigurasi ===
+MAX_PERCOBAAN_KIRIM = 5
+TIMEOUT_KIRIM = 10
+BACKOFF_DASAR = 1.0      # Detik; jeda percobaan ke-n acak di [0, BACKOFF_DASAR * 2^n]
+BACKOFF_MAKS = 60.0
+MAKS_EVENT_TERKIRIM = 10000
+
+_lock_terkirim = threading.Lock()
+_event_terkirim = OrderedDict()  # event_id -> waktu (deduplikasi pengiriman)
+_eksekutor_kirim = ThreadPoolExecutor(max_workers=4, thread_name_prefix="kirim-webhook")
+
+
+def _kirim_dengan_retry(url, body, event_id):
+    """POST body ke url dengan retry + backoff ber-jitter. Mengembalikan True jika diterima (2xx)."""
+    for percobaan in range(MAX_PERCOBAAN_KIRIM):
+        try:
+            r = requests.post(url, data=body, timeout=TIMEOUT_KIRIM,
+                              headers={'Content-Type': 'application/json', 'X-Webhook-Id': event_id})
+            if 200 <= r.status_code < 300:
+                return True
+            # 4xx selain timeout/rate limit tidak akan berhasil jika diulang
+            if 400 <= r.status_code < 500 and r.status_code not in (408, 429):
+                break
+        except requests.exceptions.RequestException as e:
+            print(f"Webhook {event_id} ke {url} gagal (percobaan {percobaan + 1}): {e}")
+        if percobaan + 1 < MAX_PERCOBAAN_KIRIM:
+            time.sleep(random.uniform(0, min(BACKOFF_MAKS, BACKOFF_DASAR * 2 ** percobaan)))
+    print(f"Webhook {event_id} ke {url} gagal dikirim setelah {MAX_PERCOBAAN_KIRIM} percobaan")
+    return False
+
+
+def _jalankan_kirim(url, body, event_id, saat_selesai):
+    berhasil = False
+    try:
+        berhasil = _kirim_dengan_retry(url, body, event_id)
+    finally:
+        if not berhasil:
+            # Event gagal boleh dikirim ulang pada evaluasi berikutnya
+            with _lock_terkirim:
+                _event_terkirim.pop(event_id, None)
+        if saat_selesai is not None:
+            saat_selesai(berhasil)
+    return berhasil
+
+
+def kirim(url, body, event_id, saat_selesai=None):
+    """
+    Menjadwalkan pengiriman webhook di background. Event dengan event_id yang sama
+    (sedang dikirim / sudah terkirim) diabaikan; mengembalikan Future atau None jika duplikat.
+    saat_selesai(berhasil) dipanggil setelah pengiriman selesai (sukses atau menyerah).
+    """
+    with _lock_terkirim:
+        if event_id in _event_terkirim:
+            return None
+        _event_terkirim[event_id] = time.time()
+        while len(_event_terkirim) > MAKS_EVENT_TERKIRIM:
+            _event_terkirim.popitem(last=False)
+    return _eksekutor_kirim.submit(_jalankan_kirim, url, body, event_id, saat_selesai)
@@ -0,0 +1,213 @@
+import fcntl
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import cache_analisis
+
+# === Konfigurasi (via environment variable) ===
+# PREFETCH_WATCHLIST        : daftar kode saham dipisah koma, mis. "BBCA,BBRI,TLKM"
+# PREFETCH_MAX_WORKERS      : jumlah analisis yang boleh berjalan bersamaan
+# PREFETCH_JEDA_DETIK       : jeda minimal antar pemanggilan pipeline (rate limit)
+# PREFETCH_INTERVAL_BERITA  : interval refresh berita/sentimen (detik)
+# PREFETCH_LOCK_DIR         : lokasi penjadwal.lock (pemilihan satu penjadwal antar worker)
+WATCHLIST = [kode.strip().upper() for kode in os.environ.get('PREFETCH_WATCHLIST', '').split(',') if kode.strip()]
+MAX_WORKERS = int(os.environ.get('PREFETCH_MAX_WORKERS', '4'))
+JEDA_DETIK = float(os.environ.get('PREFETCH_JEDA_DETIK', '1.0'))
+INTERVAL_BERITA = int(os.environ.get('PREFETCH_INTERVAL_BERITA', str(30 * 60)))
+DIREKTORI_LOCK = os.environ.get('PREFETCH_LOCK_DIR', '/tmp/n8n-prefetch')
+INTERVAL_COBA_PENJADWAL = 60  # Detik antar percobaan worker cadangan mengambil alih penjadwal
+
+# Margin tambahan TTL agar hasil prefetch belum kedaluwarsa saat refresh berikutnya berjalan
+MARGIN_TTL = 30 * 60
+
+# === Jadwal Sesi BEI (WIB, UTC+7) ===
+WIB = timezone(timedelta(hours=7))
+# Senin-Kamis: Sesi 1 buka 09:00, Sesi 2 buka 13:30; Jumat: Sesi 2 buka 14:00
+JADWAL_BUKA_SESI = {
+    0: [(9, 0), (13, 30)],
+    1: [(9, 0), (13, 30)],
+    2: [(9, 0), (13, 30)],
+    3: [(9, 0), (13, 30)],
+    4: [(9, 0), (14, 0)],
+}
+# Senin-Kamis: Sesi 1 tutup 12:00, Sesi 2 tutup 16:00 (post-trading s/d 16:15)
+# Jumat      : Sesi 1 tutup 11:30, Sesi 2 tutup 16:00 (post-trading s/d 16:15)
+JADWAL_TUTUP_SESI = {
+    0: [(12, 0), (16, 15)],
+    1: [(12, 0), (16, 15)],
+    2: [(12, 0), (16, 15)],
+    3: [(12, 0), (16, 15)],
+    4: [(11, 30), (16, 15)],
+}
+# Beri jeda setelah sesi tutup agar bar harian di yfinance sudah terbentuk
+JEDA_SETELAH_TUTUP = timedelta(minutes=15)
+
+_stop = threading.Event()
+_thread = None
+_fd_penjadwal = None
+_lock_giliran = threading.Lock()
+_waktu_mulai_terakhir = 0.0
+
+
+# === Fungsi Pembantu ===
+def waktu_refresh_berikutnya(sekarang, hanya_sesi_2=False):
+    """Mencari waktu refresh berikutnya (setelah penutupan sesi BEI) sesudah `sekarang`."""
+    for tambah_hari in range(8):
+        hari = (sekarang + timedelta(days=tambah_hari)).date()
+        jadwal = JADWAL_TUTUP_SESI.get(hari.weekday(), [])
+        if hanya_sesi_2:
+            jadwal = jadwal[-1:]
+        for jam, menit in jadwal:
+            waktu = datetime(hari.year, hari.month, hari.day, jam, menit, tzinfo=WIB) + JEDA_SETELAH_TUTUP
+            if waktu > sekarang:
+                return waktu
+    return sekarang + timedelta(days=1)
+
+
+def _waktu_sesi(hari, jam_menit):
+    return datetime(hari.year, hari.month, hari.day, jam_menit[0], jam_menit[1], tzinfo=WIB)
+
+
+def sesi_berjalan(sekarang):
+    """True jika `sekarang` berada di dalam salah satu sesi perdagangan BEI."""
+    hari = sekarang.date()
+    for buka, tutup in zip(JADWAL_BUKA_SESI.get(hari.weekday(), []), JADWAL_TUTUP_SESI.get(hari.weekday(), [])):
+        if _waktu_sesi(hari, buka) <= sekarang < _waktu_sesi(hari, tutup):
+            return True
+    return False
+
+
+def waktu_buka_berikutnya(sekarang):
+    """Mencari waktu pembukaan sesi BEI berikutnya sesudah `sekarang`."""
+    for tambah_hari in range(8):
+        hari = (sekarang + timedelta(days=tambah_hari)).date()
+        for buka in JADWAL_BUKA_SESI.get(hari.weekday(), []):
+            waktu = _waktu_sesi(hari, buka)
+            if waktu > sekarang:
+                return waktu
+    return sekarang + timedelta(days=1)
+
+
+def ttl_teknikal(sekarang, berikutnya):
+    """
+    TTL hasil prefetch teknikal. Selama sesi berjalan harga terus bergerak, jadi TTL dibatasi
+    TTL_DEFAULT (sama dengan ticker non-watchlist). Di luar sesi hasil berlaku sampai sesi
+    berikutnya dibuka (paling lama sampai refresh terjadwal berikutnya + margin).
+    """
+    ttl_default = cache_analisis.TTL_DEFAULT['teknikal']
+    if sesi_berjalan(sekarang):
+        return ttl_default
+    batas = min(berikutnya + timedelta(seconds=MARGIN_TTL), waktu_buka_berikutnya(sekarang))
+    return max(ttl_default, (batas - sekarang).total_seconds())
+
+
+def _tunggu_giliran():
+    """Rate limit sederhana: memastikan jarak minimal JEDA_DETIK antar pemanggilan pipeline."""
+    global _waktu_mulai_terakhir
+    with _lock_giliran:
+        tunggu = _waktu_mulai_terakhir + JEDA_DETIK - time.monotonic()
+        if tunggu > 0:
+            time.sleep(tunggu)
+        _waktu_mulai_terakhir = time.monotonic()
+
+
+def _prefetch_satu(jenis, kode, ttl):
+    ticker_symbol = kode + ".JK"
+    try:
+        _tunggu_giliran()
+        log, data, success = cache_analisis.jalankan_analisis(jenis, ticker_symbol, paksa=True, ttl=ttl)
+        if not success:
+            print(f"Prefetch {jenis} gagal untuk {ticker_symbol}")
+    except Exception as e:
+        print(f"Prefetch {jenis} error untuk {ticker_symbol}: {e}")
+
+
+def prefetch(jenis, daftar_kode, ttl):
+    """Menjalankan pipeline `jenis` untuk semua kode dengan konkurensi terbatas."""
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as eksekutor:
+        for kode in daftar_kode:
+            eksekutor.submit(_prefetch_satu, jenis, kode, ttl)
+
+
+def prefetch_fundamental(daftar_kode, ttl):
+    """
+    Snapshot fundamental dihitung ulang setiap hari bursa, karena harga dan rasio berbasis
+    harga (PER, PBV, yield) ikut berubah. Laporan keuangan tidak diunduh ulang di sini:
+    snapshot memakai laporan dari cache (TTL_LAPORAN) sehingga yang diulang hanya info harga.
+    """
+    prefetch('fundamental', daftar_kode, ttl)
+
+
+# === LOOP PENJADWAL ===
+def _coba_jadi_penjadwal():
+    """
+    Cache bersifat bersama antar worker, jadi cukup satu proses (pemegang penjadwal.lock)
+    yang melakukan prefetch; worker lain mencoba lagi setiap INTERVAL_COBA_PENJADWAL detik.
+    """
+    global _fd_penjadwal
+    if _fd_penjadwal is not None:
+        return True
+    os.makedirs(DIREKTORI_LOCK, exist_ok=True)
+    fd = os.open(os.path.join(DIREKTORI_LOCK, 'penjadwal.lock'), os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+    _fd_penjadwal = fd
+    return True
+
+
+def _loop_penjadwal():
+    sekarang = datetime.now(WIB)
+    berikut_teknikal = berikut_fundamental = berikut_berita = sekarang
+
+    while not _stop.is_set():
+        try:
+            penjadwal = _coba_jadi_penjadwal()
+        except OSError as e:
+            print(f"Penjadwal prefetch gagal mengambil lock: {e}")
+            penjadwal = False
+        if not penjadwal:
+            _stop.wait(INTERVAL_COBA_PENJADWAL)
+            continue
+
+        sekarang = datetime.now(WIB)
+
+        if sekarang >= berikut_teknikal:
+            berikut_teknikal = waktu_refresh_berikutnya(sekarang)
+            prefetch('teknikal', WATCHLIST, ttl_teknikal(sekarang, berikut_teknikal))
+
+        if sekarang >= berikut_fundamental:
+            berikut_fundamental = waktu_refresh_berikutnya(sekarang, hanya_sesi_2=True)
+            ttl = (berikut_fundamental - sekarang).total_seconds() + MARGIN_TTL
+            prefetch_fundamental(WATCHLIST, ttl)
+
+        if sekarang >= berikut_berita:
+            berikut_berita = sekarang + timedelta(seconds=INTERVAL_BERITA)
+            prefetch('sentimen', WATCHLIST, INTERVAL_BERITA + MARGIN_TTL)
+
+        tunggu = (min(berikut_teknikal, berikut_fundamental, berikut_berita) - datetime.now(WIB)).total_seconds()
+        _stop.wait(max(1.0, tunggu))
+
+
+def mulai_penjadwal():
+    """
+    Menyalakan penjadwal prefetch di background thread (daemon).
+    Tidak melakukan apa-apa jika PREFETCH_WATCHLIST kosong atau penjadwal sudah berjalan.
+    Setiap worker gunicorn menyalakan thread ini, tetapi hanya satu (pemegang penjadwal.lock)
+    yang benar-benar melakukan prefetch ke cache bersama; sisanya menjadi cadangan.
+    """
+    global _thread
+    if not WATCHLIST or (_thread is not None and _thread.is_alive()):
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop_penjadwal, name="penjadwal-prefetch", daemon=True)
+    _thread.start()
+
+
+def hentikan_penjadwal():
+    _stop.set()
@@ -0,0 +1,150 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+from serialisasi import dumps
+
+# === Konfigurasi ===
+# Default di folder data/ proyek (bisa diarahkan ke volume persisten lewat HASIL_DB)
+PATH_DB = os.environ.get('HASIL_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'hasil_analisis.sqlite'))
+MAKS_ANTREAN = 10000
+MAKS_BATCH_TULIS = 500
+BATAS_QUERY = 5000
+
+WIB = timezone(timedelta(hours=7))
+
+# Kolom indikator teknikal yang disimpan (ringkas, tanpa OHLC lengkap)
+KOLOM_TEKNIKAL = ['Close', 'Volume', 'RSI_14', 'MFI_14', 'MACD_12_26_9', 'MACDs_12_26_9', 'MACDh_12_26_9',
+                  'STOCHRSIk_14_14_3_3', 'STOCHRSId_14_14_3_3',
+                  'P_auto15', 'R1_auto15', 'R2_auto15', 'S1_auto15', 'S2_auto15', 'sinyal']
+KOLOM_FUNDAMENTAL = ['harga', 'PER_final', 'PBV_final', 'DER_final', 'ROE_final', 'yield_final',
+                     'BVPS_final', 'market_cap', 'tanggal_laporan']
+
+SKEMA = """
+CREATE TABLE IF NOT EXISTS hasil_analisis (
+    jenis        TEXT NOT NULL,
+    ticker       TEXT NOT NULL,
+    tanggal      TEXT NOT NULL,
+    waktu_dibuat TEXT NOT NULL,
+    ringkasan    TEXT NOT NULL,
+    PRIMARY KEY (ticker, jenis, tanggal)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_hasil_tanggal ON hasil_analisis (tanggal, jenis);
+"""
+
+_antrean = queue.Queue(maxsize=MAKS_ANTREAN)
+_lock = threading.Lock()
+_thread = None
+_lokal = threading.local()
+_jumlah_dibuang = 0
+
+
+def _koneksi():
+    # Satu koneksi per thread; WAL agar pembaca tidak terblokir penulis (juga antar worker)
+    if getattr(_lokal, 'koneksi', None) is None:
+        os.makedirs(os.path.dirname(PATH_DB), exist_ok=True)
+        koneksi = sqlite3.connect(PATH_DB, timeout=30)
+        koneksi.execute("PRAGMA journal_mode=WAL")
+        koneksi.execute("PRAGMA synchronous=NORMAL")
+        koneksi.executescript(SKEMA)
+        _lokal.koneksi = koneksi
+    return _lokal.koneksi
+
+
+# === Ringkasan per Jenis Analisis ===
+def ringkas(jenis, data):
+    """
+    Mengambil field terstruktur yang ringkas dari hasil analisis.
+    Mengembalikan (tanggal_data, dict_ringkasan) atau None jika jenis tidak disimpan.
+    """
+    hari_ini = datetime.now(WIB).strftime('%Y-%m-%d')
+    if jenis == 'teknikal':
+        return data.get('tanggal_bar') or hari_ini, {k: data.get(k) for k in KOLOM_TEKNIKAL}
+    if jenis == 'fundamental':
+        emiten = data.get('emiten', {})
+        ringkasan = {k: emiten.get(k) for k in KOLOM_FUNDAMENTAL}
+        ringkasan['sektor'] = data.get('sektor', {}).get('nama')
+        return hari_ini, ringkasan
+    if jenis == 'sentimen':
+        return hari_ini, {"sentiment_summary": data.get('sentiment_summary'), "jumlah_berita": len(data.get('news', []))}
+    return None
+
+
+# === Penulisan Asinkron ===
+def simpan_async(jenis, ticker_symbol, data):
+    """Memasukkan hasil ke antrean tulis; tidak pernah memblokir jalur request."""
+    global _jumlah_dibuang
+    hasil_ringkas = ringkas(jenis, data)
+    if hasil_ringkas is None:
+        return
+    tanggal, ringkasan = hasil_ringkas
+    baris = (jenis, ticker_symbol.replace('.JK', ''), tanggal,
+             datetime.now(WIB).strftime('%Y-%m-%d %H:%M:%S'), dumps(ringkasan).decode('utf-8'))
+    _pastikan_penulis()
+    try:
+        _antrean.put_nowait(baris)
+    except queue.Full:
+        with _lock:
+            _jumlah_dibuang += 1
+
+
+def _loop_penulis():
+    while True:
+        batch = [_antrean.get()]
+        while len(batch) < MAKS_BATCH_TULIS:
+            try:
+                batch.append(_antrean.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            koneksi = _koneksi()
+            with koneksi:
+                # Satu baris per (ticker, jenis, tanggal): hasil terbaru di hari itu menimpa yang lama
+                koneksi.executemany(
+                    "INSERT INTO hasil_analisis (jenis, ticker, tanggal, waktu_dibuat, ringkasan) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (ticker, jenis, tanggal) DO UPDATE SET "
+                    "waktu_dibuat = excluded.waktu_dibuat, ringkasan = excluded.ringkasan",
+                    batch)
+        except Exception as e:
+            print(f"Gagal menulis {len(batch)} hasil analisis ke {PATH_DB}: {e}")
+
+
+def _pastikan_penulis():
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_loop_penulis, name="penulis-hasil", daemon=True)
+            _thread.start()
+
+
+# === Query Histori ===
+def query_histori(kode, jenis=None, dari=None, sampai=None, batas=BATAS_QUERY):
+    """
+    Mengambil histori hasil analisis satu ticker (opsional: jenis & rentang tanggal 'YYYY-MM-DD'),
+    terurut menurut tanggal. Memakai primary key (ticker, jenis, tanggal) sebagai indeks.
+    """
+    sql = "SELECT jenis, tanggal, waktu_dibuat, ringkasan FROM hasil_analisis WHERE ticker = ?"
+    parameter = [kode.upper()]
+    if jenis:
+        sql += " AND jenis = ?"
+        parameter.append(jenis)
+    if dari:
+        sql += " AND tanggal >= ?"
+        parameter.append(dari)
+    if sampai:
+        sql += " AND tanggal <= ?"
+        parameter.append(sampai)
+    sql += " ORDER BY tanggal, jenis LIMIT ?"
+    parameter.append(min(int(batas), BATAS_QUERY))
+
+    return [{"jenis": j, "tanggal": t, "waktu_dibuat": w, "data": json.loads(r)}
+            for j, t, w, r in _koneksi().execute(sql, parameter)]
+
+
+def statistik():
+    return {"antrean": _antrean.qsize(), "dibuang": _jumlah_dibuang, "path": PATH_DB}
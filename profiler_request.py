@@ -0,0 +1,94 @@
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+# === Konfigurasi ===
+# Profiling hanya aktif jika PROFILING_TOKEN diisi dan request membawa token yang sama
+# di header X-Admin-Token, plus header "X-Profile: 1" atau query "?_profile=1".
+TOKEN_ADMIN = os.environ.get('PROFILING_TOKEN', '')
+DIREKTORI_PROFIL = os.environ.get('PROFILING_DIR', '/tmp/n8n-profil')
+INTERVAL_SAMPLING = float(os.environ.get('PROFILING_INTERVAL', '0.005'))  # 5 ms
+MAKS_FILE_PROFIL = 50
+
+
+def token_valid(token):
+    return bool(TOKEN_ADMIN) and hmac.compare_digest(token or '', TOKEN_ADMIN)
+
+
+def diminta(request):
+    """Cek murah per request: True hanya jika flag profil ada dan token admin cocok."""
+    if not TOKEN_ADMIN:
+        return False
+    if request.headers.get('X-Profile') != '1' and request.args.get('_profile') != '1':
+        return False
+    return token_valid(request.headers.get('X-Admin-Token'))
+
+
+# === Sampling Profiler ===
+def _nama_frame(frame):
+    kode = frame.f_code
+    return f"{kode.co_name} ({os.path.basename(kode.co_filename)}:{kode.co_firstlineno})"
+
+
+def _loop_sampling(state, thread_id):
+    while not state['stop'].wait(INTERVAL_SAMPLING):
+        frame = sys._current_frames().get(thread_id)
+        tumpukan = []
+        while frame is not None:
+            tumpukan.append(_nama_frame(frame))
+            frame = frame.f_back
+        if tumpukan:
+            state['stacks'][';'.join(reversed(tumpukan))] += 1
+
+
+def mulai_profil():
+    """Mulai men-sampling stack thread pemanggil (thread request) di thread terpisah."""
+    state = {'stop': threading.Event(), 'stacks': Counter(), 'mulai': time.perf_counter()}
+    state['thread'] = threading.Thread(target=_loop_sampling, args=(state, threading.get_ident()),
+                                       name="profiler-request", daemon=True)
+    state['thread'].start()
+    return state
+
+
+def selesai_profil(state, label):
+    """
+    Menghentikan sampling dan menulis profil format collapsed-stack
+    (kompatibel dengan flamegraph.pl / speedscope) ke DIREKTORI_PROFIL.
+    File dibagi antar worker sehingga tautannya bisa dibuka dari worker mana pun.
+    Mengembalikan (id_profil, durasi_ms, jumlah_sampel).
+    """
+    state['stop'].set()
+    state['thread'].join()
+    durasi_ms = (time.perf_counter() - state['mulai']) * 1000
+
+    id_profil = uuid.uuid4().hex[:16]
+    os.makedirs(DIREKTORI_PROFIL, exist_ok=True)
+    with open(os.path.join(DIREKTORI_PROFIL, id_profil + '.folded'), 'w') as f:
+        f.write(f"# {label} | {durasi_ms:.1f} ms | interval {INTERVAL_SAMPLING * 1000:.1f} ms\n")
+        for tumpukan, jumlah in state['stacks'].most_common():
+            f.write(f"{tumpukan} {jumlah}\n")
+
+    # Simpan hanya MAKS_FILE_PROFIL profil terbaru
+    semua = sorted((os.path.join(DIREKTORI_PROFIL, n) for n in os.listdir(DIREKTORI_PROFIL) if n.endswith('.folded')),
+                   key=os.path.getmtime)
+    for path in semua[:-MAKS_FILE_PROFIL]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return id_profil, durasi_ms, sum(state['stacks'].values())
+
+
+def baca_profil(id_profil):
+    """Mengembalikan isi profil collapsed-stack, atau None jika tidak ada."""
+    if not id_profil.isalnum():
+        return None
+    try:
+        with open(os.path.join(DIREKTORI_PROFIL, id_profil + '.folded')) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
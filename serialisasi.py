@@ -0,0 +1,119 @@
+import gzip
+import json
+import math
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from flask import Response, request, stream_with_context
+
+try:
+    import orjson
+except ImportError:  # orjson opsional, fallback ke json standar
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli opsional, fallback ke gzip
+    brotli = None
+
+# Payload di bawah ukuran ini tidak dikompres (overhead header lebih besar dari hematnya)
+MIN_UKURAN_KOMPRES = 1024
+
+
+# === Konversi tipe numpy/pandas ke tipe JSON ===
+def ke_json_aman(obj):
+    """
+    Mengubah struktur berisi tipe numpy/pandas menjadi tipe Python murni.
+    NaN / inf / NaT / pd.NA selalu menjadi None (null di JSON).
+    """
+    if isinstance(obj, dict):
+        return {str(k): ke_json_aman(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [ke_json_aman(v) for v in obj]
+    if isinstance(obj, float):  # termasuk np.float64 (subclass float)
+        return None if math.isnan(obj) or math.isinf(obj) else float(obj)
+    if isinstance(obj, (str, int, bool)) or obj is None:
+        return obj
+    if isinstance(obj, np.generic):
+        return ke_json_aman(obj.item())
+    if isinstance(obj, np.ndarray):
+        return ke_json_aman(obj.tolist())
+    if isinstance(obj, pd.Series):
+        return ke_json_aman(obj.to_dict())
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    return str(obj)
+
+
+def _default_orjson(obj):
+    # Dipanggil orjson hanya untuk tipe yang tidak dikenalnya
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, pd.Series):
+        return obj.to_dict()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+
+def dumps(obj):
+    """
+    Serialisasi ke bytes JSON. Memakai orjson jika tersedia (NaN otomatis null,
+    numpy diserialisasi native); jika tidak, konversi manual + json standar.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default_orjson,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(ke_json_aman(obj), ensure_ascii=False, allow_nan=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+# === Kompresi ===
+def kompres(body, accept_encodings):
+    """
+    Mengompres body sesuai Accept-Encoding yang sudah di-parse (request.accept_encodings).
+    Encoding dipilih menurut q-value klien (q=0 berarti ditolak); jika q sama, br diutamakan.
+    """
+    if len(body) < MIN_UKURAN_KOMPRES:
+        return body, None
+    encoding = accept_encodings.best_match(['br', 'gzip'] if brotli is not None else ['gzip'])
+    if encoding == 'br':
+        return brotli.compress(body, quality=5), 'br'
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6), 'gzip'
+    return body, None
+
+
+def respons_json(payload, status=200, boleh_kompres=False):
+    """
+    Pengganti jsonify: serialisasi cepat + NaN -> null yang konsisten.
+    Jika boleh_kompres=True (dipakai untuk respons batch), body dikompres
+    sesuai Accept-Encoding klien.
+    """
+    body = dumps(payload)
+    response = Response(body, status=status, mimetype='application/json')
+    if boleh_kompres:
+        body_kompres, encoding = kompres(body, request.accept_encodings)
+        response.vary.add('Accept-Encoding')
+        if encoding:
+            response.set_data(body_kompres)
+            response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def respons_ndjson(baris):
+    """
+    Respons streaming NDJSON: tiap objek dari iterator `baris` dikirim sebagai satu
+    baris JSON begitu tersedia (tanpa kompresi agar tiap baris langsung ter-flush).
+    """
+    def _hasilkan():
+        for objek in baris:
+            yield dumps(objek) + b'\n'
+
+    response = Response(stream_with_context(_hasilkan()), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # jangan di-buffer reverse proxy (nginx)
+    return response
@@ -0,0 +1,69 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Modul proyek berada di folder root (sama seperti api/index.py)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+class ServerLokal:
+    """
+    Server HTTP lokal untuk pengujian: menjawab dengan antrean respons (status, header)
+    yang sudah diatur, lalu respons terakhir diulang. Semua request dicatat.
+    """
+
+    def __init__(self):
+        self.respons = [(200, {})]
+        self.request = []  # (method, path, header, body)
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _jawab(self):
+                panjang = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(panjang) if panjang else b''
+                with server._lock:
+                    server.request.append((self.command, self.path, dict(self.headers), body))
+                    status, header = server.respons.pop(0) if len(server.respons) > 1 else server.respons[0]
+                self.send_response(status)
+                for nama, nilai in header.items():
+                    self.send_header(nama, nilai)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            do_GET = do_POST = _jawab
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def atur(self, *respons):
+        with self._lock:
+            self.respons = [r if isinstance(r, tuple) else (r, {}) for r in respons]
+
+    def tutup(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def server_lokal():
+    server = ServerLokal()
+    yield server
+    server.tutup()
+
+
+@pytest.fixture
+def cache_bersama_sementara(tmp_path, monkeypatch):
+    """Mengarahkan cache bersama ke folder sementara (terpisah dari /dev/shm proses lain)."""
+    import cache_bersama
+    monkeypatch.setattr(cache_bersama, 'DIREKTORI_CACHE', str(tmp_path / 'cache'))
+    monkeypatch.setattr(cache_bersama, '_peta', cache_bersama.OrderedDict())
+    return tmp_path / 'cache'
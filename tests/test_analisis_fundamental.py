@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pandas_ta')
+pytest.importorskip('yfinance')
+
+import analisis_fundamental  # noqa: E402
+
+
+def _histori(**kolom):
+    index = pd.to_datetime(['2024-03-31', '2024-06-30', '2024-09-30', '2024-12-31', '2025-03-31'])
+    return pd.DataFrame(kolom, index=index)
+
+
+def _close(mulai='2024-01-01', akhir='2025-12-31', harga=1000.0):
+    index = pd.bdate_range(mulai, akhir).as_unit('ns')
+    return pd.Series(harga, index=index)
+
+
+def test_tanggal_publikasi_memakai_jeda_laporan():
+    tanggal = analisis_fundamental._tanggal_publikasi(pd.to_datetime(['2024-06-30', '2024-12-31']))
+    assert list(tanggal) == [pd.Timestamp('2024-06-30') + pd.Timedelta(days=analisis_fundamental.LAG_LAPORAN_HARI),
+                             pd.Timestamp('2024-12-31') + pd.Timedelta(days=analisis_fundamental.LAG_LAPORAN_TAHUNAN_HARI)]
+
+
+def test_band_tidak_memakai_laporan_sebelum_dipublikasikan():
+    histori = _histori(EPS=[10.0, 20.0, 40.0, 50.0, 100.0], BVPS=[500.0] * 5)
+    seri, _ = analisis_fundamental.hitung_band_valuasi(_close(), histori)
+
+    # Laporan Q2 (akhir 30 Juni) baru terbit ~29 Agustus: Juli masih memakai EPS Q1
+    assert seri.loc['2024-07-15', 'PER'] == pytest.approx(1000 / 10)
+    assert seri.loc['2024-09-02', 'PER'] == pytest.approx(1000 / 20)
+    # Laporan tahunan (31 Desember) baru terbit ~31 Maret
+    assert seri.loc['2025-02-14', 'PER'] == pytest.approx(1000 / 40)
+    assert seri.loc['2025-04-01', 'PER'] == pytest.approx(1000 / 50)
+    # Sebelum laporan pertama terbit belum ada valuasi
+    assert np.isnan(seri.loc['2024-05-15', 'PER'])
+
+
+def test_band_dan_posisi_z_score():
+    histori = _histori(EPS=[10.0] * 5, BVPS=[500.0, np.nan, np.nan, np.nan, 1000.0])
+    close = _close(mulai='2024-06-01', akhir='2025-12-31')
+    close.iloc[-1] = 5000.0  # lonjakan harga hari terakhir
+
+    seri, band = analisis_fundamental.hitung_band_valuasi(close, histori)
+    assert band['PER']['sekarang'] == pytest.approx(500.0)
+    assert band['PER']['z_score'] > 2
+    assert band['PER']['posisi'].startswith("Sangat mahal")
+    # BVPS kosong di tengah diisi nilai terakhir yang sudah dilaporkan
+    assert seri.loc['2024-12-02', 'PBV'] == pytest.approx(1000 / 500)
+    assert seri.loc['2025-07-01', 'PBV'] == pytest.approx(1000 / 1000)
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pandas_ta')
+pytest.importorskip('yfinance')
+
+import analisis_ranking  # noqa: E402
+
+BENCHMARK = '^JKSE'
+
+
+def _closes(hari=200, **kenaikan_harian):
+    """Matriks close sintetis: tiap kolom tumbuh dengan laju harian konstan."""
+    index = pd.bdate_range('2026-01-01', periods=hari)
+    t = np.arange(hari)
+    data = {kode: 100 * (1 + laju) ** t for kode, laju in kenaikan_harian.items()}
+    data[BENCHMARK] = 100 * 1.001 ** t
+    return pd.DataFrame(data, index=index)
+
+
+def _per_ticker(hasil):
+    return {r['ticker']: r for r in hasil['ranking']}
+
+
+def test_peringkat_mengikuti_relative_strength():
+    hasil = analisis_ranking.hitung_ranking(_closes(AAAA=0.003, BBBB=0.002, CCCC=0.0, DDDD=-0.002), BENCHMARK)
+
+    assert [r['ticker'] for r in hasil['ranking']] == ['AAAA', 'BBBB', 'CCCC', 'DDDD']
+    ranking = _per_ticker(hasil)
+    assert ranking['AAAA']['outperform_benchmark'] is True
+    assert ranking['CCCC']['outperform_benchmark'] is False
+    # RS 3 bulan = (1 + return saham) / (1 + return benchmark) - 1
+    assert ranking['BBBB']['rs_3m'] == pytest.approx(1.002 ** 63 / 1.001 ** 63 - 1)
+
+
+def test_tanpa_histori_3_bulan_di_peringkat_terbawah():
+    closes = _closes(AAAA=0.003, BBBB=0.002, CCCC=0.0, DDDD=-0.002, BARU=0.01)
+    closes.loc[closes.index[:-30], 'BARU'] = np.nan  # baru listing 30 hari lalu
+
+    ranking = _per_ticker(analisis_ranking.hitung_ranking(closes, BENCHMARK))
+    assert ranking['BARU']['peringkat'] == 5
+    assert np.isnan(ranking['BARU']['skor_rs'])
+    assert ranking['BARU']['outperform_benchmark'] is None
+    assert ranking['DDDD']['peringkat'] == 4
+
+
+def test_skor_rata_rata_jendela_yang_tersedia():
+    closes = _closes(AAAA=0.003, BBBB=0.002, CCCC=0.0, TANPA6M=0.01)
+    closes.loc[closes.index[:-100], 'TANPA6M'] = np.nan  # ada 3 bulan, belum 6 bulan
+
+    ranking = _per_ticker(analisis_ranking.hitung_ranking(closes, BENCHMARK))
+    assert np.isnan(ranking['TANPA6M']['rs_6m'])
+    bobot = analisis_ranking.BOBOT_RS
+    harapan = (bobot['1m'] * ranking['TANPA6M']['rs_1m'] + bobot['3m'] * ranking['TANPA6M']['rs_3m']) / (bobot['1m'] + bobot['3m'])
+    assert ranking['TANPA6M']['skor_rs'] == pytest.approx(harapan)
+    assert ranking['TANPA6M']['peringkat'] == 1
+
+
+def test_korelasi_tanpa_saham_data_bolong():
+    closes = _closes(AAAA=0.003, BBBB=0.002, CCCC=0.001)
+    rng = np.random.default_rng(0)
+    closes = closes * np.exp(rng.normal(0, 0.01, closes.shape).cumsum(axis=0))
+    closes['BOLONG'] = closes['AAAA']
+    closes.loc[closes.index[-10], 'BOLONG'] = np.nan
+
+    korelasi = analisis_ranking.hitung_ranking(closes, BENCHMARK)['korelasi']
+    assert korelasi['tickers'] == ['AAAA', 'BBBB', 'CCCC']
+    matriks = np.array(korelasi['matriks'])
+    assert matriks.shape == (3, 3)
+    assert np.allclose(np.diag(matriks), 1.0)
+    assert len(korelasi['pasangan_teratas']) == 3
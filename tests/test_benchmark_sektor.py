@@ -0,0 +1,96 @@
+import statistics
+
+import pytest
+
+import benchmark_sektor
+
+SEKTOR = 'G. Financials'
+
+
+@pytest.fixture(autouse=True)
+def cache(cache_bersama_sementara):
+    return cache_bersama_sementara
+
+
+def _isi(sektor, nilai_per, awalan='E'):
+    for i, per in enumerate(nilai_per):
+        benchmark_sektor.perbarui_emiten(f'{awalan}{i}.JK', sektor, {'PER': per, 'PBV': per / 10, 'DER': 1.0})
+
+
+def _trimmed_mean(nilai):
+    nilai = sorted(nilai)
+    k = int(len(nilai) * benchmark_sektor.PROPORSI_TRIM)
+    return statistics.mean(nilai[k:len(nilai) - k])
+
+
+def test_median_dan_trimmed_mean():
+    nilai = [8.0, 12.0, 10.0, 300.0, 9.0, 11.0, 13.0, 7.0, 14.0, 1.0]
+    _isi(SEKTOR, nilai)
+
+    hasil = benchmark_sektor.ambil_benchmark(SEKTOR)
+    assert hasil['jumlah_emiten'] == 10
+    assert hasil['PER'] == pytest.approx(statistics.median(nilai))
+    assert hasil['PER_trimmed_mean'] == pytest.approx(_trimmed_mean(nilai))
+    assert hasil['PBV'] == pytest.approx(statistics.median(nilai) / 10)
+    assert 'berlaku_sampai' not in hasil
+
+
+def test_kurang_dari_min_emiten_pakai_tabel_statis():
+    _isi(SEKTOR, [10.0, 11.0, 12.0])
+    assert benchmark_sektor.ambil_benchmark(SEKTOR) is None
+    assert benchmark_sektor.ambil_benchmark('Sektor Kosong') is None
+
+
+def test_pembaruan_inkremental_mengganti_nilai_lama():
+    _isi(SEKTOR, [10.0, 11.0, 12.0, 13.0, 14.0])
+    benchmark_sektor.perbarui_emiten('E4.JK', SEKTOR, {'PER': 100.0, 'PBV': 1.0, 'DER': 1.0})
+
+    hasil = benchmark_sektor.ambil_benchmark(SEKTOR)
+    assert hasil['jumlah_emiten'] == 5
+    assert hasil['PER'] == 12.0
+    entri = benchmark_sektor.ambil_objek(benchmark_sektor.NAMESPACE, ('sektor', SEKTOR))[1]
+    assert entri['terurut']['PER'] == [10.0, 11.0, 12.0, 13.0, 100.0]
+
+
+def test_nilai_tidak_valid_tidak_dihitung():
+    _isi(SEKTOR, [10.0, 11.0, 12.0, 13.0, 14.0])
+    benchmark_sektor.perbarui_emiten('RUGI.JK', SEKTOR, {'PER': -5.0, 'PBV': float('nan'), 'DER': None})
+
+    hasil = benchmark_sektor.ambil_benchmark(SEKTOR)
+    assert hasil['PER'] == 12.0
+    assert hasil['jumlah_emiten'] == 5
+
+
+def test_emiten_pindah_atau_tanpa_sektor_dikeluarkan():
+    _isi(SEKTOR, [10.0, 11.0, 12.0, 13.0, 14.0, 50.0])
+    benchmark_sektor.perbarui_emiten('E5.JK', 'B. Consumer Cyclicals', {'PER': 50.0})
+    assert benchmark_sektor.ambil_benchmark(SEKTOR)['PER'] == 12.0
+
+    benchmark_sektor.perbarui_emiten('E4.JK', None, {'PER': 14.0})
+    assert benchmark_sektor.ambil_benchmark(SEKTOR) is None  # tinggal 4 emiten
+
+
+def test_emiten_kedaluwarsa_keluar_tanpa_penulisan_baru(monkeypatch):
+    waktu = [1_000_000.0]
+    monkeypatch.setattr(benchmark_sektor.time, 'time', lambda: waktu[0])
+    _isi(SEKTOR, [10.0, 11.0, 12.0, 13.0, 14.0])
+    waktu[0] += benchmark_sektor.MAKS_UMUR_EMITEN / 2
+    _isi(SEKTOR, [20.0, 21.0, 22.0, 23.0, 24.0], awalan='F')
+    assert benchmark_sektor.ambil_benchmark(SEKTOR)['jumlah_emiten'] == 10
+
+    waktu[0] += benchmark_sektor.MAKS_UMUR_EMITEN / 2 + 1
+    hasil = benchmark_sektor.ambil_benchmark(SEKTOR)
+    assert hasil['jumlah_emiten'] == 5
+    assert hasil['PER'] == 22.0
+
+
+def test_rasio_sama_tidak_ditulis_ulang(monkeypatch):
+    _isi(SEKTOR, [10.0, 11.0, 12.0, 13.0, 14.0])
+    ditulis = []
+    asli = benchmark_sektor.ubah_objek
+    monkeypatch.setattr(benchmark_sektor, 'ubah_objek', lambda *args, **kwargs: ditulis.append(args[1]) or asli(*args, **kwargs))
+
+    _isi(SEKTOR, [10.0, 11.0, 12.0, 13.0, 14.0])
+    assert ditulis == []
+    benchmark_sektor.perbarui_emiten('E0.JK', SEKTOR, {'PER': 9.0, 'PBV': 1.0, 'DER': 1.0})
+    assert ditulis == [('sektor', SEKTOR)]  # hanya objek sektornya, bukan seluruh universe
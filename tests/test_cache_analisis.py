@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+pytest.importorskip('pandas_ta')
+pytest.importorskip('yfinance')
+
+import cache_analisis  # noqa: E402
+
+TICKER = 'BBCA.JK'
+
+
+class PipelinePalsu:
+    def __init__(self):
+        self.panggilan = 0
+        self.berita = ['judul']
+
+    def __call__(self, ticker_symbol):
+        self.panggilan += 1
+        return ['ok'], {'news': list(self.berita), 'panggilan': self.panggilan}, True
+
+
+@pytest.fixture
+def pipeline(cache_bersama_sementara, monkeypatch):
+    pipeline = PipelinePalsu()
+    terbuka = set()
+    monkeypatch.setitem(cache_analisis.FUNGSI_ANALISIS, 'sentimen', pipeline)
+    monkeypatch.setattr(cache_analisis, 'breaker_terbuka', lambda host: host in terbuka)
+    monkeypatch.setattr(cache_analisis, 'simpan_async', lambda *args: None)
+    pipeline.terbuka = terbuka
+    return pipeline
+
+
+def _basikan(umur=1000):
+    """Membuat entri cache sentimen kedaluwarsa (tetap dalam batas MAKS_UMUR_BASI)."""
+    waktu, _, hasil = cache_analisis._entri('sentimen', TICKER)
+    cache_analisis.simpan_objek('analisis', ('sentimen', TICKER), (waktu - umur, waktu - 1, hasil))
+
+
+def _tunggu_refresh(pipeline, panggilan, batas=5):
+    mulai = time.monotonic()
+    while pipeline.panggilan < panggilan or cache_analisis.ambil('sentimen', TICKER) is None:
+        assert time.monotonic() - mulai < batas, "refresh background tidak selesai"
+        time.sleep(0.01)
+
+
+def test_miss_lalu_hit_segar(pipeline):
+    hasil, meta = cache_analisis.jalankan_analisis_swr('sentimen', TICKER)
+    assert meta['sumber'] == 'baru' and hasil[2]
+
+    hasil, meta = cache_analisis.jalankan_analisis_swr('sentimen', TICKER)
+    assert (meta['sumber'], meta['basi']) == ('cache', False)
+    assert pipeline.panggilan == 1
+
+
+def test_basi_disajikan_lalu_diperbarui_di_background(pipeline):
+    cache_analisis.jalankan_analisis_swr('sentimen', TICKER)
+    _basikan()
+
+    hasil, meta = cache_analisis.jalankan_analisis_swr('sentimen', TICKER)
+    assert meta['basi'] and meta['sedang_diperbarui']
+    assert meta['umur_detik'] >= 1000
+    assert hasil[1]['panggilan'] == 1  # data lama langsung dikembalikan
+
+    _tunggu_refresh(pipeline, 2)
+    hasil, meta = cache_analisis.jalankan_analisis_swr('sentimen', TICKER)
+    assert not meta['basi'] and hasil[1]['panggilan'] == 2
+
+
+@pytest.mark.parametrize('host', ['yfinance', 'news.google.com'])
+def test_basi_tanpa_refresh_jika_salah_satu_breaker_terbuka(pipeline, host):
+    cache_analisis.jalankan_analisis_swr('sentimen', TICKER)
+    _basikan()
+    pipeline.terbuka.add(host)
+
+    hasil, meta = cache_analisis.jalankan_analisis_swr('sentimen', TICKER)
+    assert meta['basi'] and not meta['sedang_diperbarui']
+    assert hasil[2]
+    time.sleep(0.05)
+    assert pipeline.panggilan == 1
+
+
+def test_tanpa_cache_dan_breaker_terbuka_gagal_seketika(pipeline):
+    pipeline.terbuka.add('news.google.com')
+
+    hasil, meta = cache_analisis.jalankan_analisis_swr('sentimen', TICKER)
+    assert meta['sumber'] == 'breaker_terbuka'
+    assert hasil[2] is False and 'news.google.com' in hasil[0][0]
+    assert pipeline.panggilan == 0
+
+
+def test_hasil_parsial_tidak_menimpa_entri_lama(pipeline):
+    cache_analisis.jalankan_analisis_swr('sentimen', TICKER)
+    pipeline.terbuka.add('news.google.com')  # breaker terbuka di tengah pipeline
+    pipeline.berita = []
+
+    cache_analisis.jalankan_analisis('sentimen', TICKER, paksa=True)
+    assert cache_analisis.ambil('sentimen', TICKER)[1]['news'] == ['judul']
+
+
+def test_refresh_dilewati_jika_worker_lain_sedang_memperbarui(pipeline):
+    cache_analisis.jalankan_analisis_swr('sentimen', TICKER)
+    _basikan()
+    kunci_worker_lain = cache_analisis.coba_kunci('refresh', ('sentimen', TICKER))
+
+    hasil, meta = cache_analisis.jalankan_analisis_swr('sentimen', TICKER)
+    assert meta['basi'] and hasil[2]
+    time.sleep(0.05)
+    assert pipeline.panggilan == 1
+    assert cache_analisis.metrik_cache()['sedang_refresh'] == 0
+
+    cache_analisis.lepas_kunci(kunci_worker_lain)
+    cache_analisis.jalankan_analisis_swr('sentimen', TICKER)
+    _tunggu_refresh(pipeline, 2)
@@ -0,0 +1,134 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cache_bersama
+
+
+@pytest.fixture(autouse=True)
+def cache(cache_bersama_sementara):
+    return cache_bersama_sementara
+
+
+def _frame(baris=5, tz='Asia/Jakarta', mulai=100.0):
+    index = pd.date_range('2026-01-05', periods=baris, freq='D', tz=tz, name='Date').as_unit('ns')
+    return pd.DataFrame({'Close': np.arange(baris) + mulai, 'Volume': np.arange(baris, dtype='int64') * 1000},
+                        index=index)
+
+
+# === Frame numerik ===
+def test_frame_dikembalikan_utuh_dengan_dtype_dan_zona_waktu():
+    asli = _frame()
+    assert cache_bersama.simpan_frame('histori', ('BBCA.JK', '2y', '1d'), asli)
+
+    data = cache_bersama.ambil_frame('histori', ('BBCA.JK', '2y', '1d'), maks_umur=60)
+    pd.testing.assert_frame_equal(data, asli, check_freq=False)
+    data['RSI_14'] = 1.0  # salinan boleh diubah pemanggil
+
+
+def test_frame_tanpa_salin_menunjuk_langsung_ke_mmap():
+    cache_bersama.simpan_frame('histori', 'kunci', _frame())
+
+    pertama = cache_bersama.ambil_frame('histori', 'kunci', maks_umur=60, salin=False)
+    kedua = cache_bersama.ambil_frame('histori', 'kunci', maks_umur=60, salin=False)
+    _, _, matriks = cache_bersama._petakan(cache_bersama._path('histori', 'kunci', '.frame'))
+    assert np.shares_memory(pertama['Close'].to_numpy(), matriks)
+    assert np.shares_memory(pertama['Close'].to_numpy(), kedua['Close'].to_numpy())
+    assert not matriks.flags.writeable
+
+
+def test_frame_kedaluwarsa_atau_tidak_ada():
+    cache_bersama.simpan_frame('histori', 'kunci', _frame())
+    assert cache_bersama.ambil_frame('histori', 'kunci', maks_umur=0) is None
+    assert cache_bersama.ambil_frame('histori', 'lain', maks_umur=60) is None
+
+
+def test_frame_non_numerik_ditolak():
+    data = _frame()
+    data['Nama'] = 'BBCA'
+    assert not cache_bersama.simpan_frame('histori', 'kunci', data)
+    assert not cache_bersama.simpan_frame('histori', 'kunci', data.reset_index(drop=True))
+
+
+def test_penerbitan_baru_tidak_mengganggu_view_lama():
+    cache_bersama.simpan_frame('histori', 'kunci', _frame(mulai=100.0))
+    lama = cache_bersama.ambil_frame('histori', 'kunci', maks_umur=60, salin=False)
+    time.sleep(0.01)  # mtime berbeda agar versi baru terdeteksi
+
+    cache_bersama.simpan_frame('histori', 'kunci', _frame(baris=6, mulai=200.0))
+    baru = cache_bersama.ambil_frame('histori', 'kunci', maks_umur=60, salin=False)
+    assert len(baru) == 6 and baru['Close'].iloc[0] == 200.0
+    assert len(lama) == 5 and lama['Close'].iloc[0] == 100.0  # file lama sudah diganti, mmap tetap valid
+
+
+# === Objek ===
+def test_objek_disimpan_dan_dibaca():
+    assert cache_bersama.ambil_objek('info', 'BBCA.JK') is None
+    cache_bersama.simpan_objek('info', 'BBCA.JK', {'sector': 'Financial Services'})
+    waktu, objek = cache_bersama.ambil_objek('info', 'BBCA.JK')
+    assert objek == {'sector': 'Financial Services'}
+    assert time.time() - waktu < 5
+    assert cache_bersama.jumlah_entri('info') == 1
+
+
+def test_ubah_objek_tidak_kehilangan_penulisan_antar_proses():
+    jumlah_proses, jumlah_ubah = 4, 25
+    anak = []
+    for p in range(jumlah_proses):
+        pid = os.fork()
+        if pid == 0:
+            for i in range(jumlah_ubah):
+                cache_bersama.ubah_objek('benchmark', 'emiten', lambda d: d.__setitem__(f'{p}-{i}', i), default=dict)
+            os._exit(0)
+        anak.append(pid)
+    for pid in anak:
+        os.waitpid(pid, 0)
+
+    assert len(cache_bersama.ambil_objek('benchmark', 'emiten')[1]) == jumlah_proses * jumlah_ubah
+
+
+def test_bersihkan_menghapus_entri_lama_kecuali_lock(monkeypatch):
+    cache_bersama.simpan_objek('info', 'lama', 1)
+    cache_bersama.simpan_objek('info', 'baru', 2)
+    cache_bersama.lepas_kunci(cache_bersama.coba_kunci('info', 'kunci'))
+    lama = time.time() - cache_bersama.MAKS_UMUR_FILE - 10
+    for path in (cache_bersama._path('info', 'lama', '.pkl'), cache_bersama._path('info', 'kunci', '.lock')):
+        os.utime(path, (lama, lama))
+
+    cache_bersama.bersihkan()
+    assert cache_bersama.ambil_objek('info', 'lama') is None
+    assert cache_bersama.ambil_objek('info', 'baru') is not None
+    assert os.path.exists(cache_bersama._path('info', 'kunci', '.lock'))
+
+
+# === Kunci lintas worker ===
+def test_kunci_eksklusif_sampai_dilepas():
+    pertama = cache_bersama.coba_kunci('refresh', ('teknikal', 'BBCA.JK'))
+    assert pertama is not None
+    assert cache_bersama.coba_kunci('refresh', ('teknikal', 'BBCA.JK')) is None
+    assert cache_bersama.coba_kunci('refresh', ('teknikal', 'BBRI.JK')) is not None
+
+    cache_bersama.lepas_kunci(pertama)
+    assert cache_bersama.coba_kunci('refresh', ('teknikal', 'BBCA.JK')) is not None
+
+
+def test_kunci_antar_proses_lepas_saat_pemegang_mati():
+    siap_baca, siap_tulis = os.pipe()
+    selesai_baca, selesai_tulis = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        berkas = cache_bersama.coba_kunci('refresh', 'kunci')
+        os.write(siap_tulis, b'1' if berkas is not None else b'0')
+        os.read(selesai_baca, 1)  # tunggu induk selesai memeriksa
+        os._exit(0)  # mati tanpa melepas kunci
+    assert os.read(siap_baca, 1) == b'1'
+    assert cache_bersama.coba_kunci('refresh', 'kunci') is None
+
+    os.write(selesai_tulis, b'1')
+    os.waitpid(pid, 0)
+    assert cache_bersama.coba_kunci('refresh', 'kunci') is not None
+    for fd in (siap_baca, siap_tulis, selesai_baca, selesai_tulis):
+        os.close(fd)
@@ -0,0 +1,75 @@
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pandas_ta')
+pytest.importorskip('yfinance')
+pytest.importorskip('mplfinance')
+
+import grafik_teknikal  # noqa: E402
+
+PNG = b'\x89PNG'
+
+
+class EksekutorLangsung:
+    """Menjalankan render di proses pengujian (tanpa process pool)."""
+
+    def submit(self, fungsi, *args):
+        future = Future()
+        future.set_result(fungsi(*args))
+        return future
+
+
+def _ohlcv(baris):
+    index = pd.bdate_range('2026-01-05', periods=baris)
+    close = 1000 + np.arange(baris, dtype=float) * 5
+    return pd.DataFrame({'Open': close - 5, 'High': close + 10, 'Low': close - 10, 'Close': close,
+                         'Volume': np.full(baris, 1e6)}, index=index)
+
+
+def _indikator_histori_pendek(data):
+    # Seperti pandas_ta pada histori pendek: MACD/RSI tidak dibuat, pivot tetap ada
+    for kolom in ('P_auto15', 'R1_auto15', 'S1_auto15', 'R2_auto15', 'S2_auto15'):
+        data[kolom] = data['Close']
+    return {}, data['High'].max(), data['Low'].min()
+
+
+@pytest.fixture
+def grafik(cache_bersama_sementara, monkeypatch):
+    monkeypatch.setattr(grafik_teknikal, '_ambil_eksekutor', EksekutorLangsung)
+    monkeypatch.setattr(grafik_teknikal, 'hitung_indikator', _indikator_histori_pendek)
+
+
+def test_histori_pendek_tanpa_macd_rsi_tetap_digambar(grafik, monkeypatch):
+    monkeypatch.setattr(grafik_teknikal, 'ambil_histori', lambda *args, **kwargs: _ohlcv(8))
+
+    png, pesan = grafik_teknikal.get_chart_png('BARU.JK', '1mo')
+    assert pesan is None
+    assert png.startswith(PNG)
+
+
+def test_render_dengan_semua_panel():
+    data = _ohlcv(40)
+    data['MACD_12_26_9'] = data['MACDs_12_26_9'] = data['MACDh_12_26_9'] = np.linspace(-1, 1, 40)
+    data['RSI_14'] = np.linspace(20, 80, 40)
+    _indikator_histori_pendek(data)
+
+    assert grafik_teknikal._render_png(data, {'0.618 (Golden)': 1100}, 'BBCA (1d)').startswith(PNG)
+
+
+def test_png_di_cache_sampai_bar_terakhir_berubah(grafik, monkeypatch):
+    data = _ohlcv(8)
+    monkeypatch.setattr(grafik_teknikal, 'ambil_histori', lambda *args, **kwargs: data.copy())
+    render = []
+    asli = grafik_teknikal._render_png
+    monkeypatch.setattr(grafik_teknikal, '_render_png', lambda *args: render.append(1) or asli(*args))
+
+    pertama, _ = grafik_teknikal.get_chart_png('BBCA.JK')
+    kedua, _ = grafik_teknikal.get_chart_png('BBCA.JK')
+    assert pertama == kedua and len(render) == 1
+
+    data.iloc[-1, data.columns.get_loc('Close')] += 25
+    grafik_teknikal.get_chart_png('BBCA.JK')
+    assert len(render) == 2
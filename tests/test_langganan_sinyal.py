@@ -0,0 +1,116 @@
+import json
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pandas_ta')
+pytest.importorskip('yfinance')
+
+import langganan_sinyal  # noqa: E402
+import pengiriman_webhook  # noqa: E402
+
+
+class PasarPalsu:
+    """Bar terakhir dan sinyal yang akan 'dihitung' oleh get_technical_analysis palsu."""
+
+    def __init__(self):
+        self.tanggal = '2026-01-05'
+        self.close = 100.0
+        self.sinyal = 'BULLISH'
+
+    def histori(self, ticker_symbol, **kwargs):
+        return pd.DataFrame({'Close': [self.close]}, index=pd.DatetimeIndex([self.tanggal]))
+
+    def analisis(self, ticker_symbol, data=None):
+        return [], {'sinyal': self.sinyal, 'tanggal_bar': self.tanggal, 'harga_terakhir': self.close}, True
+
+
+@pytest.fixture
+def pasar(tmp_path, monkeypatch):
+    pasar = PasarPalsu()
+    monkeypatch.setattr(langganan_sinyal, 'DIREKTORI_WEBHOOK', str(tmp_path))
+    monkeypatch.setattr(langganan_sinyal, '_versi_terakhir', {})
+    monkeypatch.setattr(langganan_sinyal, 'ambil_histori', pasar.histori)
+    monkeypatch.setattr(langganan_sinyal, 'get_technical_analysis', pasar.analisis)
+    monkeypatch.setattr(langganan_sinyal.cache_analisis, 'simpan', lambda *args, **kwargs: None)
+    monkeypatch.setattr(pengiriman_webhook, 'BACKOFF_DASAR', 0.01)
+    monkeypatch.setattr(pengiriman_webhook, 'MAX_PERCOBAAN_KIRIM', 2)
+    return pasar
+
+
+def _evaluasi():
+    for future in langganan_sinyal.evaluasi_sekali():
+        future.result(timeout=10)
+
+
+def _state(id_langganan):
+    return {l['id']: l for l in langganan_sinyal.daftar_langganan()}[id_langganan]['state']
+
+
+def test_webhook_hanya_dikirim_saat_transisi(pasar, server_lokal):
+    langganan = langganan_sinyal.tambah_langganan('BBCA', 'sinyal_berubah', server_lokal.url)
+
+    _evaluasi()  # evaluasi pertama hanya mencatat state awal
+    assert server_lokal.request == []
+    assert _state(langganan['id']) == 'BULLISH'
+
+    pasar.close = 101.0  # bar bergerak, sinyal tetap
+    _evaluasi()
+    assert server_lokal.request == []
+
+    pasar.close, pasar.sinyal = 95.0, 'BEARISH'
+    _evaluasi()
+    assert len(server_lokal.request) == 1
+    body = json.loads(server_lokal.request[0][3])
+    assert (body['state_lama'], body['state_baru']) == ('BULLISH', 'BEARISH')
+    assert _state(langganan['id']) == 'BEARISH'
+
+
+def test_flip_dalam_satu_bar_tidak_terdeduplikasi(pasar, server_lokal):
+    langganan_sinyal.tambah_langganan('BBCA', 'sinyal_berubah', server_lokal.url)
+    _evaluasi()
+
+    for close, sinyal in [(95.0, 'BEARISH'), (101.0, 'BULLISH'), (94.0, 'BEARISH')]:
+        pasar.close, pasar.sinyal = close, sinyal
+        _evaluasi()
+
+    event_id = [r[2]['X-Webhook-Id'] for r in server_lokal.request]
+    assert len(event_id) == 3 and len(set(event_id)) == 3
+
+
+def test_pengiriman_gagal_dikirim_ulang(pasar, server_lokal):
+    langganan = langganan_sinyal.tambah_langganan('BBCA', 'sinyal_berubah', server_lokal.url)
+    _evaluasi()
+
+    server_lokal.atur(500)
+    pasar.close, pasar.sinyal = 95.0, 'BEARISH'
+    _evaluasi()
+    assert len(server_lokal.request) == 2  # MAX_PERCOBAAN_KIRIM
+    assert _state(langganan['id']) == 'BULLISH'  # state tidak disimpan sebelum webhook diterima
+
+    server_lokal.atur(200)
+    _evaluasi()  # bar tidak berubah, tetapi transisi yang gagal dievaluasi ulang
+    assert len(server_lokal.request) == 3
+    assert len({r[2]['X-Webhook-Id'] for r in server_lokal.request}) == 1
+    assert _state(langganan['id']) == 'BEARISH'
+
+
+def test_langganan_baru_langsung_mendapat_state_awal(pasar, server_lokal):
+    langganan_sinyal.tambah_langganan('BBCA', 'sinyal_berubah', server_lokal.url)
+    _evaluasi()
+
+    baru = langganan_sinyal.tambah_langganan('BBCA', 'sinyal_berubah', server_lokal.url)
+    _evaluasi()  # bar belum berubah
+    assert _state(baru['id']) == 'BULLISH'
+
+    pasar.close, pasar.sinyal = 95.0, 'BEARISH'
+    _evaluasi()
+    assert len(server_lokal.request) == 2  # kedua langganan menerima transisi
+
+
+def test_callback_diizinkan(monkeypatch):
+    assert not langganan_sinyal.callback_diizinkan('ftp://contoh.com/hook')
+    assert langganan_sinyal.callback_diizinkan('https://n8n.contoh.com/webhook/x')
+    monkeypatch.setattr(langganan_sinyal, 'HOST_DIIZINKAN', {'n8n.contoh.com'})
+    assert langganan_sinyal.callback_diizinkan('https://n8n.contoh.com/webhook/x')
+    assert not langganan_sinyal.callback_diizinkan('http://169.254.169.254/latest/meta-data')
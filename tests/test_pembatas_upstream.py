@@ -0,0 +1,214 @@
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+import pembatas_upstream
+
+HOST = '127.0.0.1'  # host server_lokal
+
+
+@pytest.fixture(autouse=True)
+def state_terpisah(tmp_path, monkeypatch):
+    monkeypatch.setattr(pembatas_upstream, 'DIREKTORI_STATE', str(tmp_path))
+    monkeypatch.setattr(pembatas_upstream, '_fd_host', {})
+    monkeypatch.setattr(pembatas_upstream, '_lock_host', {})
+    monkeypatch.setattr(pembatas_upstream, '_breaker', {})
+    monkeypatch.setattr(pembatas_upstream, 'BACKOFF_DASAR', 0.01)
+    monkeypatch.setenv('UPSTREAM_BUDGET_127_0_0_1', '100,5')
+    yield tmp_path
+    for fd in pembatas_upstream._fd_host.values():
+        os.close(fd)
+
+
+def _faktor(direktori, host=HOST):
+    """Faktor laju yang tersimpan di file state bersama (dibaca seperti worker lain membacanya)."""
+    with open(os.path.join(direktori, host + '.bucket'), 'rb') as f:
+        _, _, faktor = struct.unpack(pembatas_upstream._FORMAT_STATE, f.read())
+    return faktor
+
+
+def test_429_diulang_dan_faktor_laju_dibagi_dua(server_lokal, state_terpisah, monkeypatch):
+    # Tanpa pemulihan agar faktor yang tersimpan murni hasil pemotongan saat 429
+    monkeypatch.setattr(pembatas_upstream, 'FAKTOR_NAIK', 0.0)
+    server_lokal.atur((429, {'Retry-After': '0'}), (429, {'Retry-After': '0'}), 200)
+
+    r = pembatas_upstream.http_get(server_lokal.url + '/quote')
+
+    assert r.status_code == 200
+    assert len(server_lokal.request) == 3
+    assert _faktor(state_terpisah) == pytest.approx(pembatas_upstream.FAKTOR_TURUN ** 2)
+    assert pembatas_upstream.status_breaker()[HOST]['status'] == 'tertutup'
+
+
+def test_429_terus_menerus_menyerah_setelah_maks_percobaan(server_lokal, state_terpisah, monkeypatch):
+    monkeypatch.setattr(pembatas_upstream, 'MAX_PERCOBAAN', 3)
+    server_lokal.atur((429, {'Retry-After': '0'}))
+
+    with pytest.raises(pembatas_upstream.UpstreamRateLimited):
+        pembatas_upstream.http_get(server_lokal.url)
+
+    assert len(server_lokal.request) == 3
+    # Percobaan terakhir langsung dilempar, sehingga laju dipotong MAX_PERCOBAAN - 1 kali
+    assert _faktor(state_terpisah) == pytest.approx(pembatas_upstream.FAKTOR_TURUN ** 2)
+
+
+def test_retry_after_dihormati(server_lokal):
+    server_lokal.atur((429, {'Retry-After': '1'}), 200)
+
+    mulai = time.monotonic()
+    assert pembatas_upstream.http_get(server_lokal.url).status_code == 200
+    assert time.monotonic() - mulai >= 1.0
+    assert len(server_lokal.request) == 2
+
+
+def test_budget_host_dihormati(server_lokal, monkeypatch):
+    # 5 token/detik dengan burst 2: 7 request butuh setidaknya (7 - 2) / 5 = 1 detik
+    monkeypatch.setenv('UPSTREAM_BUDGET_127_0_0_1', '5,2')
+
+    mulai = time.monotonic()
+    with ThreadPoolExecutor(max_workers=7) as eksekutor:
+        hasil = list(eksekutor.map(lambda _: pembatas_upstream.http_get(server_lokal.url), range(7)))
+    durasi = time.monotonic() - mulai
+
+    assert all(r.status_code == 200 for r in hasil)
+    assert len(server_lokal.request) == 7
+    assert durasi >= 0.95
+
+
+def test_token_dikosongkan_setelah_429(server_lokal, monkeypatch):
+    # Setelah 429 token = 0 dan laju 10 * 0.5 token/detik: retry menunggu ~0.2 detik
+    monkeypatch.setenv('UPSTREAM_BUDGET_127_0_0_1', '10,5')
+    server_lokal.atur((429, {'Retry-After': '0'}), 200)
+
+    mulai = time.monotonic()
+    assert pembatas_upstream.http_get(server_lokal.url).status_code == 200
+    assert time.monotonic() - mulai >= 0.18
+
+
+# === Circuit breaker jalur yfinance ===
+@pytest.fixture
+def breaker_cepat(monkeypatch):
+    monkeypatch.setattr(pembatas_upstream, 'AMBANG_GAGAL_BREAKER', 3)
+    monkeypatch.setattr(pembatas_upstream, 'MAX_PERCOBAAN', 2)
+    monkeypatch.setenv('UPSTREAM_BUDGET_YFINANCE', '1000,100')
+
+
+def _status_yfinance():
+    return pembatas_upstream.status_breaker()['yfinance']
+
+
+def test_breaker_terbuka_setelah_timeout_curl_cffi(breaker_cepat):
+    curl_exceptions = pytest.importorskip('curl_cffi.requests.exceptions')
+    panggilan = []
+
+    def _timeout():
+        panggilan.append(1)
+        raise curl_exceptions.Timeout("Operation timed out after 30001 milliseconds")
+
+    for _ in range(3):
+        with pytest.raises(curl_exceptions.Timeout):
+            pembatas_upstream.panggil_yfinance(_timeout)
+    assert _status_yfinance()['status'] == 'terbuka'
+
+    jumlah = len(panggilan)
+    with pytest.raises(pembatas_upstream.UpstreamTidakTersedia):
+        pembatas_upstream.panggil_yfinance(_timeout)
+    assert len(panggilan) == jumlah  # short-circuit: upstream tidak dipanggil
+    assert pembatas_upstream.breaker_terbuka('yfinance')
+
+
+def test_breaker_terbuka_jika_frame_tetap_kosong(breaker_cepat):
+    pd = pytest.importorskip('pandas')
+
+    for _ in range(3):
+        hasil = pembatas_upstream.panggil_yfinance(pd.DataFrame, kosong=pembatas_upstream.frame_kosong)
+        assert hasil.empty  # frame kosong tetap dikembalikan ke pemanggil
+    assert _status_yfinance()['status'] == 'terbuka'
+
+
+def test_error_non_upstream_netral(breaker_cepat):
+    for _ in range(5):
+        with pytest.raises(KeyError):
+            pembatas_upstream.panggil_yfinance(lambda: {}['regularMarketPrice'])
+    assert _status_yfinance()['status'] == 'tertutup'
+    assert _status_yfinance()['gagal_beruntun'] == 0
+
+
+def test_breaker_setengah_terbuka_pulih_setelah_sukses(breaker_cepat, monkeypatch):
+    monkeypatch.setattr(pembatas_upstream, 'DURASI_BUKA_BREAKER', 0.05)
+
+    def _gagal():
+        raise requests.exceptions.ConnectionError("connection refused")
+
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            pembatas_upstream.panggil_yfinance(_gagal)
+    assert pembatas_upstream.breaker_terbuka('yfinance')
+
+    time.sleep(0.06)
+    assert not pembatas_upstream.breaker_terbuka('yfinance')
+    assert pembatas_upstream.panggil_yfinance(lambda: 'ok') == 'ok'
+    assert _status_yfinance()['status'] == 'tertutup'
+
+
+# === Retry jalur yfinance (curl_cffi) ===
+def test_panggil_yfinance_mengulang_timeout_curl_cffi(monkeypatch):
+    curl_exceptions = pytest.importorskip('curl_cffi.requests.exceptions')
+    monkeypatch.setenv('UPSTREAM_BUDGET_YFINANCE', '1000,100')
+    error = [curl_exceptions.Timeout("Operation timed out"), curl_exceptions.ConnectionError("Failed to connect")]
+
+    def _fungsi():
+        if error:
+            raise error.pop(0)
+        return 'data'
+
+    assert pembatas_upstream.panggil_yfinance(_fungsi) == 'data'
+    assert error == []
+    assert pembatas_upstream.status_breaker()['yfinance']['gagal_beruntun'] == 0
+
+
+def test_panggil_yfinance_menyerah_setelah_maks_percobaan(monkeypatch):
+    curl_exceptions = pytest.importorskip('curl_cffi.requests.exceptions')
+    monkeypatch.setenv('UPSTREAM_BUDGET_YFINANCE', '1000,100')
+    monkeypatch.setattr(pembatas_upstream, 'MAX_PERCOBAAN', 3)
+    panggilan = []
+
+    def _timeout():
+        panggilan.append(1)
+        raise curl_exceptions.Timeout("Operation timed out")
+
+    with pytest.raises(curl_exceptions.Timeout):
+        pembatas_upstream.panggil_yfinance(_timeout)
+    assert len(panggilan) == 3
+    assert pembatas_upstream.status_breaker()['yfinance']['gagal_beruntun'] == 1
+
+
+def test_panggil_yfinance_rate_limit_memotong_laju(state_terpisah, monkeypatch):
+    yf_exceptions = pytest.importorskip('yfinance.exceptions')
+    monkeypatch.setenv('UPSTREAM_BUDGET_YFINANCE', '1000,100')
+    monkeypatch.setattr(pembatas_upstream, 'FAKTOR_NAIK', 0.0)
+    error = [yf_exceptions.YFRateLimitError()]
+
+    def _fungsi():
+        if error:
+            raise error.pop(0)
+        return 'data'
+
+    assert pembatas_upstream.panggil_yfinance(_fungsi) == 'data'
+    assert _faktor(state_terpisah, 'yfinance') == pytest.approx(pembatas_upstream.FAKTOR_TURUN)
+
+
+def test_error_non_jaringan_tidak_diulang(monkeypatch):
+    panggilan = []
+
+    def _fungsi():
+        panggilan.append(1)
+        raise ValueError("kolom tidak ada")
+
+    with pytest.raises(ValueError):
+        pembatas_upstream.panggil_yfinance(_fungsi)
+    assert len(panggilan) == 1
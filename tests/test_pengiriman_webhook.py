@@ -0,0 +1,64 @@
+import uuid
+
+import pytest
+
+import pengiriman_webhook
+
+
+@pytest.fixture(autouse=True)
+def backoff_cepat(monkeypatch):
+    monkeypatch.setattr(pengiriman_webhook, 'BACKOFF_DASAR', 0.01)
+
+
+def _event_id():
+    return uuid.uuid4().hex[:20]
+
+
+def test_retry_sampai_diterima(server_lokal):
+    server_lokal.atur(503, (429, {'Retry-After': '0'}), 200)
+    event_id = _event_id()
+    hasil = []
+
+    future = pengiriman_webhook.kirim(server_lokal.url + '/hook', b'{"a": 1}', event_id, saat_selesai=hasil.append)
+
+    assert future.result(timeout=10) is True
+    assert hasil == [True]
+    assert len(server_lokal.request) == 3
+    assert {r[2]['X-Webhook-Id'] for r in server_lokal.request} == {event_id}
+    assert all(r[3] == b'{"a": 1}' for r in server_lokal.request)
+
+
+def test_event_sama_hanya_dikirim_sekali(server_lokal):
+    event_id = _event_id()
+
+    pertama = pengiriman_webhook.kirim(server_lokal.url, b'{}', event_id)
+    assert pertama.result(timeout=10) is True
+    assert pengiriman_webhook.kirim(server_lokal.url, b'{}', event_id) is None
+    assert len(server_lokal.request) == 1
+
+
+def test_4xx_tidak_diulang_dan_event_boleh_dikirim_lagi(server_lokal):
+    server_lokal.atur(400)
+    event_id = _event_id()
+    hasil = []
+
+    future = pengiriman_webhook.kirim(server_lokal.url, b'{}', event_id, saat_selesai=hasil.append)
+
+    assert future.result(timeout=10) is False
+    assert hasil == [False]
+    assert len(server_lokal.request) == 1
+
+    # Pengiriman yang gagal tidak menahan event_id: evaluasi berikutnya boleh mengirim ulang
+    server_lokal.atur(200)
+    assert pengiriman_webhook.kirim(server_lokal.url, b'{}', event_id).result(timeout=10) is True
+    assert len(server_lokal.request) == 2
+
+
+def test_menyerah_setelah_maks_percobaan(server_lokal, monkeypatch):
+    monkeypatch.setattr(pengiriman_webhook, 'MAX_PERCOBAAN_KIRIM', 3)
+    server_lokal.atur(500)
+
+    future = pengiriman_webhook.kirim(server_lokal.url, b'{}', _event_id())
+
+    assert future.result(timeout=10) is False
+    assert len(server_lokal.request) == 3
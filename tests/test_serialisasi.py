@@ -0,0 +1,51 @@
+import gzip
+import json
+
+import numpy as np
+import pytest
+from flask import Flask
+
+import serialisasi
+
+app = Flask(__name__)
+PAYLOAD = {'ticker': 'BBCA', 'teks': 'x' * 4000, 'nilai': np.float64('nan')}
+
+
+def _respons(accept_encoding):
+    with app.test_request_context(headers={'Accept-Encoding': accept_encoding}):
+        return serialisasi.respons_json(PAYLOAD, boleh_kompres=True)
+
+
+@pytest.mark.parametrize('accept_encoding, harapan', [
+    ('', None),
+    ('identity', None),
+    ('gzip', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('gzip;q=1.0, br;q=0.5', 'gzip'),
+    ('GZIP', 'gzip'),
+    ('gzip;q=0', None),
+    ('*;q=0, gzip', 'gzip'),
+])
+def test_encoding_mengikuti_q_value(accept_encoding, harapan, monkeypatch):
+    monkeypatch.setattr(serialisasi, 'brotli', None)  # hasil tidak bergantung pada brotli terpasang
+    response = _respons(accept_encoding)
+    assert response.headers.get('Content-Encoding') == harapan
+    assert 'Accept-Encoding' in response.vary
+
+
+def test_br_diutamakan_jika_q_sama():
+    pytest.importorskip('brotli')
+    assert _respons('gzip, br').headers['Content-Encoding'] == 'br'
+    assert _respons('br;q=0, gzip').headers['Content-Encoding'] == 'gzip'
+
+
+def test_body_gzip_valid_dan_nan_menjadi_null(monkeypatch):
+    monkeypatch.setattr(serialisasi, 'brotli', None)
+    response = _respons('gzip')
+    assert json.loads(gzip.decompress(response.get_data()))['nilai'] is None
+
+
+def test_payload_kecil_tidak_dikompres():
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip, br'}):
+        response = serialisasi.respons_json({'a': 1}, boleh_kompres=True)
+    assert 'Content-Encoding' not in response.headers